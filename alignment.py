@@ -0,0 +1,147 @@
+# alignment.py - Locate annotated lyric fragments in a song's lyrics
+#
+# Fragments and lyrics are compared as word tokens, cleaned the same way as
+# TokenizedLyrics. All of a song's fragments are found in one pass over its
+# words with an Aho-Corasick automaton. Each occurrence becomes a word span.
+# Overlapping spans are merged, which gives the fraction of words covered by
+# annotations for the whole song and for each line.
+
+import re
+from collections import deque
+from lyrics_text import SECTION_HEADER_PATTERN, PUNCTUATION_PATTERN, clean_lyrics
+
+WORD_PATTERN = re.compile(r"\S+")
+
+
+class FragmentMatcher:
+    """Aho-Corasick automaton over word sequences; finds every occurrence of every pattern in one scan"""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]  # (pattern index, pattern length) ending at each state
+
+        for index, pattern in enumerate(patterns):
+            if not pattern:
+                continue
+            state = 0
+            for word in pattern:
+                next_state = self._goto[state].get(word)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][word] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append([])
+                state = next_state
+            self._outputs[state].append((index, len(pattern)))
+
+        # Breadth-first, so every state's failure link is final before its children are linked
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(word, 0)
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+
+    def find(self, words):
+        """Yield (pattern index, start, end) word spans, end exclusive, for every match in words"""
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        for position, word in enumerate(words):
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            for index, length in outputs[state]:
+                yield index, position + 1 - length, position + 1
+
+
+def merge_intervals(spans):
+    """Merge overlapping or touching (start, end) spans into a sorted list of disjoint spans"""
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [tuple(span) for span in merged]
+
+
+def lyric_words(lyrics):
+    """Split lyrics into cleaned words, returning (words, char_spans, line_numbers)
+
+    Words match TokenizedLyrics tokens; char_spans are (start, end) offsets
+    of each word in the original lyrics and line_numbers the line it is on.
+    """
+    # Blank out section headers in place so character offsets still match the original text
+    text = SECTION_HEADER_PATTERN.sub(lambda match: ' ' * len(match.group()), lyrics)
+
+    words = []
+    char_spans = []
+    line_numbers = []
+    offset = 0
+    for line_number, line in enumerate(text.split('\n')):
+        for match in WORD_PATTERN.finditer(line):
+            word = PUNCTUATION_PATTERN.sub('', match.group()).lower()
+            if word:
+                words.append(word)
+                char_spans.append((offset + match.start(), offset + match.end()))
+                line_numbers.append(line_number)
+        offset += len(line) + 1
+    return words, char_spans, line_numbers
+
+
+def fragment_words(fragment):
+    """Clean a lyric fragment into words the same way as the lyrics"""
+    return clean_lyrics(fragment, header_replacement=' ').split()
+
+
+class AnnotationAlignment:
+    """Where a song's annotated fragments occur in its lyrics, and how much of the song they cover"""
+
+    __slots__ = ('word_count', 'covered_words', 'fragment_spans', 'merged_spans', 'line_coverage', 'unmatched')
+
+    def __init__(self, lyrics, fragments):
+        fragments = list(fragments)
+        words, char_spans, line_numbers = lyric_words(lyrics or '')
+        matcher = FragmentMatcher([fragment_words(fragment) for fragment in fragments])
+
+        word_spans = [[] for _ in fragments]
+        for index, start, end in matcher.find(words):
+            word_spans[index].append((start, end))
+
+        self.word_count = len(words)
+        # {fragment: [(first word, last word + 1, first char, last char + 1), ...]} for every occurrence
+        self.fragment_spans = {
+            fragment: [(start, end, char_spans[start][0], char_spans[end - 1][1]) for start, end in spans]
+            for fragment, spans in zip(fragments, word_spans) if spans
+        }
+        self.unmatched = [fragment for fragment, spans in zip(fragments, word_spans) if not spans]
+        self.merged_spans = merge_intervals(span for spans in word_spans for span in spans)
+        self.covered_words = sum(end - start for start, end in self.merged_spans)
+
+        # Per-line word and covered word counts, walking the merged spans once
+        line_totals = {}
+        line_covered = {}
+        for line_number in line_numbers:
+            line_totals[line_number] = line_totals.get(line_number, 0) + 1
+        for start, end in self.merged_spans:
+            for line_number in line_numbers[start:end]:
+                line_covered[line_number] = line_covered.get(line_number, 0) + 1
+        self.line_coverage = {line_number: line_covered.get(line_number, 0) / total
+                              for line_number, total in line_totals.items()}
+
+    @property
+    def coverage(self):
+        """Fraction of the song's words inside at least one annotated fragment"""
+        return self.covered_words / self.word_count if self.word_count else 0
+
+
+def align_annotations(song_data):
+    """Align a processed song's annotation_map fragments with its lyrics"""
+    return AnnotationAlignment(song_data.get('lyrics', ''), song_data.get('annotation_map', {}))
@@ -0,0 +1,262 @@
+# annotation_index.py - Persistent inverted index over lyric fragments and annotations
+#
+# Postings map each term to the annotations (one document per annotated lyric
+# fragment) and the field it occurs in, with the term's positions so phrase
+# queries can be answered from the index alone. Songs can be added or
+# re-indexed at any time; re-indexing a song replaces its previous documents.
+
+import math
+import re
+import threading
+from array import array
+from config import ANNOTATION_INDEX_ENABLED, ANNOTATION_INDEX_PATH
+from sqlite_store import DefaultStore, connect
+
+FIELDS = {'fragment': 0, 'annotation': 1}
+
+TOKEN_PATTERN = re.compile(r"[\w']+")
+
+# A query is a mix of "quoted phrases" and single terms
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+# How many document ids to pass to SQLite per IN (...) clause
+CANDIDATE_CHUNK = 500
+
+
+def tokenize(text):
+    """Lowercase word tokens of a text, in order"""
+    return [token.strip("'") for token in TOKEN_PATTERN.findall(text.lower()) if token.strip("'")]
+
+
+def song_key(song_data):
+    """The id a song's documents are stored under, or '' for songs without one"""
+    song_id = song_data.get('song_id')
+    return '' if song_id is None else str(song_id)
+
+
+def parse_query(query):
+    """Split a query into a list of phrases (lists of terms); single words are one-term phrases"""
+    phrases = []
+    for quoted, word in QUERY_PATTERN.findall(query):
+        terms = tokenize(quoted if quoted else word)
+        if terms:
+            phrases.append(terms)
+    return phrases
+
+
+class AnnotationIndex:
+    """SQLite-backed inverted index supporting keyword and "phrase" queries over annotations"""
+
+    def __init__(self, path=ANNOTATION_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        # Access to the shared connection is serialized by _lock
+        self._conn = connect(path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id INTEGER PRIMARY KEY,
+                song_id TEXT NOT NULL,
+                title TEXT,
+                artist TEXT,
+                fragment TEXT NOT NULL,
+                annotation TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS documents_song ON documents (song_id);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                doc_id INTEGER NOT NULL,
+                field INTEGER NOT NULL,
+                positions BLOB NOT NULL,
+                PRIMARY KEY (term, doc_id, field)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+        """)
+
+    def add_songs(self, song_data_list):
+        """Index the annotation maps of processed songs, replacing any earlier version of each song"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                # Only the last version of a song repeated in the batch is kept. Songs without an id
+                # can't be told apart or re-indexed later, so they are skipped.
+                songs = {song_key(song_data): song_data for song_data in song_data_list
+                         if song_data and song_key(song_data)}
+                postings = []
+                for song_id, song_data in songs.items():
+                    postings.extend(self._index_song(song_id, song_data))
+                # Inserting in key order keeps B-tree writes local, which matters for large batches
+                postings.sort()
+                self._conn.executemany("INSERT INTO postings (term, doc_id, field, positions) VALUES (?, ?, ?, ?)",
+                                       postings)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _index_song(self, song_id, song_data):
+        """Store a song's documents and return their postings rows"""
+        self._remove_song(song_id)
+
+        postings = []
+        for fragment, annotation in song_data.get('annotation_map', {}).items():
+            cursor = self._conn.execute(
+                "INSERT INTO documents (song_id, title, artist, fragment, annotation) VALUES (?, ?, ?, ?, ?)",
+                (song_id, song_data.get('title', ''), song_data.get('artist', ''), fragment, annotation)
+            )
+            doc_id = cursor.lastrowid
+            for field, text in ((FIELDS['fragment'], fragment), (FIELDS['annotation'], annotation)):
+                positions = {}
+                for position, term in enumerate(tokenize(text)):
+                    positions.setdefault(term, array('I')).append(position)
+                postings.extend((term, doc_id, field, term_positions.tobytes())
+                                for term, term_positions in positions.items())
+        return postings
+
+    def _remove_song(self, song_id):
+        doc_ids = [(row[0],) for row in
+                   self._conn.execute("SELECT doc_id FROM documents WHERE song_id = ?", (song_id,))]
+        if doc_ids:
+            self._conn.executemany("DELETE FROM postings WHERE doc_id = ?", doc_ids)
+            self._conn.execute("DELETE FROM documents WHERE song_id = ?", (song_id,))
+
+    def remove_song(self, song_id):
+        """Drop a song's annotations from the index"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._remove_song(str(song_id))
+            self._conn.execute("COMMIT")
+
+    def _postings(self, term, fields, candidates=None):
+        """Return {doc_id: {field: positions}} for a term, optionally limited to candidate documents"""
+        field_clause = f"AND field IN ({','.join('?' * len(fields))})"
+        if candidates is None:
+            rows = self._conn.execute(
+                f"SELECT doc_id, field, positions FROM postings WHERE term = ? {field_clause}", (term, *fields))
+        else:
+            candidates = sorted(candidates)
+            rows = []
+            for start in range(0, len(candidates), CANDIDATE_CHUNK):
+                chunk = candidates[start:start + CANDIDATE_CHUNK]
+                rows.extend(self._conn.execute(
+                    f"SELECT doc_id, field, positions FROM postings WHERE term = ? {field_clause} "
+                    f"AND doc_id IN ({','.join('?' * len(chunk))})", (term, *fields, *chunk)))
+
+        postings = {}
+        for doc_id, field, blob in rows:
+            positions = array('I')
+            positions.frombytes(blob)
+            postings.setdefault(doc_id, {})[field] = positions
+        return postings
+
+    def _document_frequency(self, term, fields):
+        return self._conn.execute(
+            f"SELECT COUNT(*) FROM postings WHERE term = ? AND field IN ({','.join('?' * len(fields))})",
+            (term, *fields)
+        ).fetchone()[0]
+
+    def search(self, query, field=None, limit=50):
+        """Find annotations matching every term and "quoted phrase" in the query
+
+        field restricts matching to 'fragment' or 'annotation' (default both).
+        Results are dicts with the document's song_id, title, artist, fragment,
+        annotation, the fields that matched and a tf-idf score, best first.
+        """
+        phrases = parse_query(query)
+        if not phrases:
+            return []
+        fields = (FIELDS[field],) if field else tuple(FIELDS.values())
+
+        with self._lock:
+            total_docs = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            terms = sorted({term for phrase in phrases for term in phrase})
+            frequencies = {term: self._document_frequency(term, fields) for term in terms}
+            if not total_docs or not all(frequencies.values()):
+                return []
+
+            # Intersect from the rarest term so later lookups only touch candidate documents
+            postings = {}
+            candidates = None
+            for term in sorted(terms, key=frequencies.get):
+                postings[term] = self._postings(term, fields, candidates)
+                candidates = set(postings[term]) if candidates is None else candidates & set(postings[term])
+                if not candidates:
+                    return []
+
+            scores = {}
+            matched_fields = {}
+            for doc_id in candidates:
+                score = 0.0
+                doc_fields = set()
+                for phrase in phrases:
+                    hits = {field_id: self._phrase_hits(phrase, postings, doc_id, field_id) for field_id in fields}
+                    hits = {field_id: count for field_id, count in hits.items() if count}
+                    if not hits:
+                        break
+                    idf = sum(math.log(1 + total_docs / frequencies[term]) for term in phrase)
+                    score += sum(hits.values()) * idf
+                    doc_fields.update(hits)
+                else:
+                    scores[doc_id] = score
+                    matched_fields[doc_id] = doc_fields
+
+            ranked = sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))[:limit]
+            documents = {}
+            if ranked:
+                rows = self._conn.execute(
+                    f"SELECT doc_id, song_id, title, artist, fragment, annotation FROM documents "
+                    f"WHERE doc_id IN ({','.join('?' * len(ranked))})", ranked)
+                documents = {row[0]: row for row in rows}
+
+        field_names = {field_id: name for name, field_id in FIELDS.items()}
+        return [{
+            'song_id': documents[doc_id][1],
+            'title': documents[doc_id][2],
+            'artist': documents[doc_id][3],
+            'fragment': documents[doc_id][4],
+            'annotation': documents[doc_id][5],
+            'matched': sorted(field_names[field_id] for field_id in matched_fields[doc_id]),
+            'score': scores[doc_id],
+        } for doc_id in ranked]
+
+    @staticmethod
+    def _phrase_hits(phrase, postings, doc_id, field):
+        """Count occurrences of consecutive phrase terms in one field of a document"""
+        position_lists = []
+        for term in phrase:
+            positions = postings[term].get(doc_id, {}).get(field)
+            if not positions:
+                return 0
+            position_lists.append(positions)
+        if len(phrase) == 1:
+            return len(position_lists[0])
+
+        starts = set(position_lists[0])
+        for offset, positions in enumerate(position_lists[1:], start=1):
+            starts &= {position - offset for position in positions}
+            if not starts:
+                return 0
+        return len(starts)
+
+    def stats(self):
+        """Return the number of indexed songs, annotations and distinct terms"""
+        with self._lock:
+            songs, documents = self._conn.execute(
+                "SELECT COUNT(DISTINCT song_id), COUNT(*) FROM documents").fetchone()
+            terms = self._conn.execute("SELECT COUNT(DISTINCT term) FROM postings").fetchone()[0]
+        return {'songs': songs, 'annotations': documents, 'terms': terms}
+
+    def close(self):
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+_default_index = DefaultStore(AnnotationIndex, "Annotation index unavailable, songs will not be indexed")
+
+
+def get_default_index():
+    """Return the process-wide persistent annotation index, or None if disabled or unavailable"""
+    if not ANNOTATION_INDEX_ENABLED:
+        return None
+    return _default_index.get()
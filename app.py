@@ -1,11 +1,23 @@
 # app.py - Streamlit web application for Genius Lyrics Analyzer
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
 import os
 import time
-from genius_analyzer import GeniusLyricsAnalyzer
-from config import GENIUS_API_TOKEN, MAX_TOP_SONGS, WEIGHTS
+import pandas as pd
+from genius_analyzer import get_analyzer
+from scoring import ScoringWeights, compute_ranking_features, rescore_songs
+from charts import complexity_chart
+from exports import OUTPUT_FORMATS, MIME_TYPES, output_path, table_bytes
+from annotation_index import AnnotationIndex, get_default_index
+from workshop import RhymeIndex, RHYME_STRENGTH_LABELS, count_themes, rhyme_scheme
+from config import GENIUS_API_TOKEN, MAX_TOP_SONGS, WEIGHTS, OUTPUT_FORMAT
+
+
+def get_rhyme_index(results):
+    """Rhyme index over the lyrics of a result set, built on first use and kept with the results"""
+    if 'rhyme_index' not in results:
+        results['rhyme_index'] = RhymeIndex.from_songs(results.get('processed_songs', []))
+    return results['rhyme_index']
+
 
 # Page configuration
 st.set_page_config(
@@ -113,18 +125,23 @@ with st.sidebar.expander("Advanced Options"):
         help="How much importance to give to annotation coverage"
     )
 
-    # Normalize weights to sum to 1
-    total = lexical_weight + annotation_weight
-    if total > 0:
-        WEIGHTS['lexical_diversity'] = lexical_weight / total
-        WEIGHTS['annotation_density'] = annotation_weight / total
+    # Weights for this session only, normalized to sum to 1 (config.WEIGHTS is shared and read-only)
+    scoring_weights = ScoringWeights(lexical_diversity=lexical_weight,
+                                     annotation_density=annotation_weight).normalized()
+    if lexical_weight + annotation_weight == 0:
+        st.warning("Both weights are 0, so songs are ranked with the default weights.")
 
 # Run button
 run_analysis = st.sidebar.button("Run Analysis", type="primary")
 
 # Add an option to save files
 save_files = st.sidebar.checkbox("Save files to disk", value=False,
-                                 help="If checked, CSV and image files will be saved to disk. Otherwise, they'll only be available for download.")
+                                 help="If checked, data and image files will be saved to disk. Otherwise, they'll only be available for download.")
+
+# Format for saved and downloaded tables; Parquet and Feather are much smaller than CSV for large annotation sets
+output_format = st.sidebar.selectbox("Data file format", list(OUTPUT_FORMATS),
+                                     index=list(OUTPUT_FORMATS).index(OUTPUT_FORMAT),
+                                     format_func=lambda name: 'CSV' if name == 'csv' else name.capitalize())
 
 # Main content area
 st.title("Genius Lyrics Analyzer")
@@ -163,58 +180,74 @@ if run_analysis:
         # Show progress
         progress_bar = st.progress(0)
 
-        # Initialize analyzer
-        update_status("Initializing analyzer...")
-        analyzer = GeniusLyricsAnalyzer(token)
-
-
-        # Create a status callback that also updates progress
-        def status_callback(message):
-            update_status(message)
-            # Simple heuristic to update progress
-            if "Initializing" in message:
-                progress_bar.progress(10)
-            elif "Searching" in message or "found artist" in message:
-                progress_bar.progress(20)
-            elif "Processing song" in message:
-                progress_bar.progress(30)
-            elif "Getting annotations" in message:
-                progress_bar.progress(50)
-            elif "Analyzing complexity" in message:
-                progress_bar.progress(70)
-            elif "Creating" in message and "dataframe" in message:
-                progress_bar.progress(80)
-            elif "Ranking songs" in message:
-                progress_bar.progress(90)
-            elif "Visualization saved" in message:
-                progress_bar.progress(100)
+        # Songs and partial rankings are rendered here as they arrive
+        live_songs = st.empty()
+        live_ranking = st.empty()
 
+        # Reuse the shared analyzer for this token so connections stay warm
+        update_status("Initializing analyzer...")
+        analyzer = get_analyzer(token)
 
         # Run the appropriate analysis with save_files parameter
         try:
             update_status(f"Starting analysis for {artist_name}...")
 
             if analysis_type == "Artist's Top Songs":
-                results = analyzer.run_analysis(
-                    artist_name,
-                    max_songs=max_songs,
-                    status_callback=status_callback,
-                    save_files=save_files
-                )
+                analysis_options = {'max_songs': max_songs}
             elif analysis_type == "Album":
-                results = analyzer.run_analysis(
-                    artist_name,
-                    album_name=album_name,
-                    status_callback=status_callback,
-                    save_files=save_files
-                )
-            elif analysis_type == "Single Song":
-                results = analyzer.run_analysis(
-                    artist_name,
-                    song_name=song_name,
-                    status_callback=status_callback,
-                    save_files=save_files
-                )
+                analysis_options = {'album_name': album_name}
+            else:
+                analysis_options = {'song_name': song_name}
+
+            # Progress: 0-30% finding songs (one lyrics page per song), 30-90% processing
+            # songs, then tabulating, ranking and plotting. Timing events arrive on this thread.
+            expected_songs = {"Artist's Top Songs": max_songs, "Single Song": 1}.get(analysis_type, MAX_TOP_SONGS)
+            lyrics_fetched = []
+            finalizing = []
+
+            def track_progress(timing_event):
+                phase = timing_event['phase']
+                if phase == 'lyrics' and 'song_id' not in timing_event:
+                    lyrics_fetched.append(timing_event)
+                    progress_bar.progress(min(29, int(30 * len(lyrics_fetched) / max(expected_songs, 1))))
+                elif phase == 'tabulate' or (finalizing and phase in ('ranking', 'plotting')):
+                    finalizing.append(phase)
+                    progress_bar.progress({'tabulate': 92, 'ranking': 95, 'plotting': 99}[phase])
+
+            results = None
+            finished_songs = []
+            for event in analyzer.iter_analysis(artist_name, status_callback=update_status, save_files=save_files,
+                                                weights=scoring_weights, output_format=output_format,
+                                                instrument=track_progress, **analysis_options):
+                if event['type'] == 'songs_found':
+                    progress_bar.progress(30)
+                elif event['type'] == 'song':
+                    progress_bar.progress(30 + int(60 * event['completed'] / max(event['total'], 1)))
+                    song = event['song']
+                    finished_songs.append({
+                        'Song': song['title'],
+                        'Word Count': song['complexity'].get('word_count', 0),
+                        'Lexical Diversity': round(song['complexity'].get('lexical_diversity', 0), 4),
+                        'Annotations': len(song.get('annotation_map', {}))
+                    })
+                    with live_songs.container():
+                        st.caption(f"Processed {event['completed']} of {event['total']} songs")
+                        st.dataframe(finished_songs, use_container_width=True)
+                elif event['type'] == 'ranking':
+                    with live_ranking.container():
+                        st.caption(f"Ranking so far ({event['completed']} of {event['total']} songs)")
+                        partial = event['ranked_songs'][['title', 'word_count', 'lexical_diversity',
+                                                         'annotation_count', 'complexity_score']]
+                        partial.columns = ['Song', 'Word Count', 'Lexical Diversity', 'Annotations',
+                                           'Complexity Score']
+                        st.dataframe(partial, use_container_width=True)
+                elif event['type'] == 'complete':
+                    results = event['results']
+
+            # Add the new annotations to the persistent search index, if enabled
+            persistent_index = get_default_index()
+            if persistent_index is not None and results:
+                persistent_index.add_songs(results.get('processed_songs', []))
 
             # Store results in session state
             st.session_state.results = results
@@ -240,6 +273,12 @@ if st.session_state.results:
     annotations_df = results.get('annotations_df')
     output_files = results.get('output_files', {})
 
+    # Re-rank from the stored features so weight changes apply instantly, without refetching
+    if ranked_songs is not None and not ranked_songs.empty:
+        if 'ranking_features' not in results:
+            results['ranking_features'] = compute_ranking_features(songs_df)
+        ranked_songs = rescore_songs(results['ranking_features'], scoring_weights)
+
     # Check if we have valid results
     if songs_df is not None and not songs_df.empty:
         # Overview tab
@@ -283,18 +322,42 @@ if st.session_state.results:
                     </div>
                     """, unsafe_allow_html=True)
 
+            # Remixes, live versions and other duplicates that were skipped
+            if results.get('duplicates'):
+                duplicates = results['duplicates']
+                with st.expander(f"Skipped duplicates ({len(duplicates)})"):
+                    st.dataframe(pd.DataFrame([{
+                        'Skipped': entry['merged'],
+                        'Same as': entry['kept'],
+                        'Matched on': entry['reason'],
+                        'Lyrics similarity': None if entry['similarity'] is None else round(entry['similarity'], 2)
+                    } for entry in duplicates]), use_container_width=True)
+
+            # Where the time went in this run
+            if results.get('timings'):
+                with st.expander("Run timings"):
+                    timings = pd.DataFrame.from_dict(results['timings'], orient='index')
+                    timings = timings.sort_values('total_s', ascending=False)
+                    st.dataframe(timings[['count', 'total_s', 'p50_ms', 'p90_ms', 'p95_ms', 'p99_ms', 'max_ms',
+                                          'bytes', 'cache_hits', 'cache_misses']].round(1),
+                                 use_container_width=True)
+                    st.caption("Request phases (search, lyrics, metadata, referents) are included in "
+                               "find_songs and process_song.")
+
             # Output files
             if output_files:
                 st.subheader("Output Files")
                 for file_type, file_path in output_files.items():
                     if os.path.exists(file_path):
                         with open(file_path, "rb") as file:
-                            if file_path.endswith(".csv"):
+                            table_format = next((name for name, extension in OUTPUT_FORMATS.items()
+                                                 if file_path.endswith(extension)), None)
+                            if table_format:
                                 btn = st.download_button(
                                     label=f"Download {os.path.basename(file_path)}",
                                     data=file,
                                     file_name=os.path.basename(file_path),
-                                    mime="text/csv"
+                                    mime=MIME_TYPES[table_format]
                                 )
                             elif file_path.endswith(".png"):
                                 btn = st.download_button(
@@ -316,12 +379,15 @@ if st.session_state.results:
                 display_df['Rank'] = range(1, len(display_df) + 1)
                 display_df['lexical_diversity'] = display_df['lexical_diversity'].map('{:.4f}'.format)
                 display_df['complexity_score'] = display_df['complexity_score'].map('{:.4f}'.format)
+                if 'annotation_coverage' not in display_df:
+                    display_df['annotation_coverage'] = float('nan')
+                display_df['annotation_coverage'] = display_df['annotation_coverage'].map('{:.0%}'.format)
 
                 # Select and rename columns
-                display_df = display_df[['Rank', 'title', 'word_count', 'unique_word_count',
-                                         'lexical_diversity', 'annotation_count', 'complexity_score']]
-                display_df.columns = ['Rank', 'Song', 'Word Count', 'Unique Words',
-                                      'Lexical Diversity', 'Annotations', 'Complexity Score']
+                display_df = display_df[['Rank', 'title', 'word_count', 'unique_word_count', 'lexical_diversity',
+                                         'annotation_count', 'annotation_coverage', 'complexity_score']]
+                display_df.columns = ['Rank', 'Song', 'Word Count', 'Unique Words', 'Lexical Diversity',
+                                      'Annotations', 'Lyrics Annotated', 'Complexity Score']
 
                 # Display the table
                 st.dataframe(display_df, use_container_width=True)
@@ -330,8 +396,8 @@ if st.session_state.results:
                 with st.expander("How is the Complexity Score calculated?"):
                     st.markdown(f"""
                     The complexity score is a weighted combination of:
-                    - **Lexical Diversity** (weight: {WEIGHTS['lexical_diversity']:.1f}): The ratio of unique words to total words
-                    - **Annotation Density** (weight: {WEIGHTS['annotation_density']:.1f}): The number of annotations relative to song length
+                    - **Lexical Diversity** (weight: {scoring_weights.lexical_diversity:.1f}): The ratio of unique words to total words
+                    - **Annotation Density** (weight: {scoring_weights.annotation_density:.1f}): The number of annotations relative to song length
 
                     The score is normalized so that the highest possible value is 1.0.
                     """)
@@ -344,88 +410,19 @@ if st.session_state.results:
 
             # Check if we have ranked songs
             if ranked_songs is not None and not ranked_songs.empty and len(ranked_songs) > 1:
-                # Create a visualization
-                temp_viz_path = f"{artist_name.replace(' ', '_')}_complexity_analysis.png"
-
-                # Check if output_files has the visualization
-                if 'output_files' in results and 'visualization_file' in results['output_files']:
-                    viz_path = results['output_files']['visualization_file']
-                    if os.path.exists(viz_path):
-                        # Display the existing visualization
-                        st.image(viz_path, use_column_width=True)
-
-                        # Add download button
-                        with open(viz_path, "rb") as file:
-                            st.download_button(
-                                label="Download Visualization",
-                                data=file,
-                                file_name=os.path.basename(viz_path),
-                                mime="image/png"
-                            )
-                    else:
-                        st.info("Visualization file not found.")
-                else:
-                    # We need to create a new visualization
-                    # First, initialize the analyzer if it's not defined
-                    if 'analyzer' not in locals() and 'analyzer' not in globals():
-                        try:
-                            analyzer = GeniusLyricsAnalyzer(token)
-                            # Now create the visualization
-                            viz_created = analyzer.visualize_song_complexity(ranked_songs, save_path=temp_viz_path,
-                                                                             status_callback=None)
-
-                            if viz_created and os.path.exists(temp_viz_path):
-                                # Display the visualization
-                                st.image(temp_viz_path, use_column_width=True)
-
-                                # Add download button for the visualization
-                                with open(temp_viz_path, "rb") as file:
-                                    st.download_button(
-                                        label="Download Visualization",
-                                        data=file,
-                                        file_name=os.path.basename(temp_viz_path),
-                                        mime="image/png"
-                                    )
-
-                                # If save_files is False, remove the file after displaying
-                                if not save_files:
-                                    try:
-                                        os.remove(temp_viz_path)
-                                    except:
-                                        pass  # Ignore if file can't be removed
-                            else:
-                                st.info("Visualization could not be created.")
-                        except:
-                            st.error("Could not create visualization. Try running the analysis again.")
-                    else:
-                        # Use the existing analyzer
-                        try:
-                            viz_created = analyzer.visualize_song_complexity(ranked_songs, save_path=temp_viz_path,
-                                                                             status_callback=None)
-
-                            if viz_created and os.path.exists(temp_viz_path):
-                                # Display the visualization
-                                st.image(temp_viz_path, use_column_width=True)
-
-                                # Add download button for the visualization
-                                with open(temp_viz_path, "rb") as file:
-                                    st.download_button(
-                                        label="Download Visualization",
-                                        data=file,
-                                        file_name=os.path.basename(temp_viz_path),
-                                        mime="image/png"
-                                    )
-
-                                # If save_files is False, remove the file after displaying
-                                if not save_files:
-                                    try:
-                                        os.remove(temp_viz_path)
-                                    except:
-                                        pass  # Ignore if file can't be removed
-                            else:
-                                st.info("Visualization could not be created.")
-                        except:
-                            st.error("Could not create visualization. Try running the analysis again.")
+                # Rendered in memory for the current ranking; reruns and other sessions
+                # with the same data reuse the cached image
+                try:
+                    chart_png = complexity_chart(ranked_songs)
+                    st.image(chart_png, use_column_width=True)
+                    st.download_button(
+                        label="Download Visualization",
+                        data=chart_png,
+                        file_name=f"{artist_name.replace(' ', '_')}_complexity_analysis.png",
+                        mime="image/png"
+                    )
+                except Exception:
+                    st.error("Could not create visualization. Try running the analysis again.")
 
                 # Explanation
                 st.markdown("""
@@ -439,31 +436,30 @@ if st.session_state.results:
             else:
                 st.info("No visualization available.")
 
-            # Add download buttons for CSV files
+            # Add download buttons for the data tables
             if not songs_df.empty:
                 st.subheader("Data Downloads")
+                format_label = output_format.capitalize() if output_format != 'csv' else 'CSV'
 
                 col1, col2 = st.columns(2)
 
                 with col1:
                     # Download button for songs analysis
-                    csv_songs = songs_df.to_csv(index=False).encode('utf-8')
                     st.download_button(
-                        label="Download Songs Analysis CSV",
-                        data=csv_songs,
-                        file_name=f"{artist_name.replace(' ', '_')}_songs_analysis.csv",
-                        mime="text/csv"
+                        label=f"Download Songs Analysis {format_label}",
+                        data=table_bytes(songs_df, output_format),
+                        file_name=output_path(f"{artist_name.replace(' ', '_')}_songs_analysis", output_format),
+                        mime=MIME_TYPES[output_format]
                     )
 
                 with col2:
                     if not annotations_df.empty:
                         # Download button for annotations
-                        csv_annotations = annotations_df.to_csv(index=False).encode('utf-8')
                         st.download_button(
-                            label="Download Annotations CSV",
-                            data=csv_annotations,
-                            file_name=f"{artist_name.replace(' ', '_')}_annotations.csv",
-                            mime="text/csv"
+                            label=f"Download Annotations {format_label}",
+                            data=table_bytes(annotations_df, output_format),
+                            file_name=output_path(f"{artist_name.replace(' ', '_')}_annotations", output_format),
+                            mime=MIME_TYPES[output_format]
                         )
 
         # Annotations tab
@@ -471,6 +467,29 @@ if st.session_state.results:
             st.header("Lyrics and Annotations")
 
             if annotations_df is not None and not annotations_df.empty:
+                # Search the persistent index when enabled, otherwise an in-memory index of this analysis
+                search_index = get_default_index()
+                if search_index is None:
+                    if 'annotation_index' not in results:
+                        results['annotation_index'] = AnnotationIndex(':memory:')
+                        results['annotation_index'].add_songs(results.get('processed_songs', []))
+                    search_index = results['annotation_index']
+
+                query = st.text_input("Search annotations",
+                                      help='Match every word; use "quotes" for exact phrases')
+                if query:
+                    matches = search_index.search(query, limit=25)
+                    st.caption(f"{len(matches)} matching annotation{'s' if len(matches) != 1 else ''}")
+                    for match in matches:
+                        with st.expander(f"{match['title']}: \"{match['fragment'][:50]}...\""):
+                            st.markdown(f"""
+                            <div class="annotation-box">
+                                <div class="lyric-fragment">"{match['fragment']}"</div>
+                                <p>{match['annotation']}</p>
+                            </div>
+                            """, unsafe_allow_html=True)
+                    st.markdown("---")
+
                 # Group by song
                 song_titles = annotations_df['title'].unique()
 
@@ -512,7 +531,6 @@ if st.session_state.results:
                 # Get data from the analysis
                 results = st.session_state.results
                 songs_df = results.get('songs_df')
-                ranked_songs = results.get('ranked_songs')
                 annotations_df = results.get('annotations_df')
 
                 # Create columns for different tools
@@ -564,27 +582,10 @@ if st.session_state.results:
                     st.subheader("Theme Inspiration")
 
                     if annotations_df is not None and not annotations_df.empty:
-                        # Extract themes from annotations
-                        all_annotations = " ".join(annotations_df['annotation'].tolist())
-
-                        # List of common theme words to look for
-                        theme_words = [
-                            "love", "heartbreak", "struggle", "hope", "freedom",
-                            "identity", "change", "time", "memory", "loss",
-                            "power", "conflict", "journey", "transformation", "nature",
-                            "society", "politics", "religion", "faith", "doubt",
-                            "joy", "pain", "longing", "desire", "fear"
-                        ]
-
-                        # Count occurrences of theme words
-                        theme_counts = {}
-                        for theme in theme_words:
-                            count = all_annotations.lower().count(theme)
-                            if count > 0:
-                                theme_counts[theme] = count
-
-                        # Sort by count
-                        sorted_themes = sorted(theme_counts.items(), key=lambda x: x[1], reverse=True)
+                        # Count theme words once per result set; reruns reuse the counts
+                        if 'theme_counts' not in results:
+                            results['theme_counts'] = count_themes(annotations_df['annotation'])
+                        sorted_themes = list(results['theme_counts'].items())
 
                         # Display top themes
                         st.markdown("Common themes in these songs:")
@@ -668,25 +669,15 @@ if st.session_state.results:
                                 last_words = [line.split()[-1].lower().strip('.,!?;:"\'') for line in lines if
                                               line.split()]
 
-                                # Find rhyming patterns
-                                rhyme_pattern = []
-                                rhyme_groups = {}
-                                current_letter = 'A'
-
-                                for word in last_words:
-                                    # Very simple rhyme detection based on last 2 characters
-                                    # A more sophisticated system would use phonetics
-                                    ending = word[-2:] if len(word) >= 2 else word
-
-                                    if ending in rhyme_groups:
-                                        rhyme_pattern.append(rhyme_groups[ending])
-                                    else:
-                                        rhyme_groups[ending] = current_letter
-                                        rhyme_pattern.append(current_letter)
-                                        current_letter = chr(ord(current_letter) + 1)
+                                # Label line endings that rhyme with the same letter
+                                st.markdown(f"Detected rhyme pattern: **{rhyme_scheme(last_words)}**")
 
-                                # Display rhyme pattern
-                                st.markdown(f"Detected rhyme pattern: **{''.join(rhyme_pattern)}**")
+                                # Suggest rhymes from the analyzed songs for the final line
+                                if last_words[-1]:
+                                    closing_rhymes = get_rhyme_index(results).rhymes(last_words[-1], limit=5)
+                                    if closing_rhymes:
+                                        st.markdown(f"Rhymes for \"{last_words[-1]}\" from the analyzed songs: " +
+                                                    ", ".join(word for word, _ in closing_rhymes))
 
                         # Simple word frequency analysis
                         if word_count > 10:
@@ -720,34 +711,15 @@ if st.session_state.results:
                 rhyme_word = st.text_input("Enter a word to find rhymes for:")
 
                 if rhyme_word:
-                    # Simple rhyme suggestion based on word endings
-                    # In a full implementation, you'd use a phonetic rhyming dictionary
                     st.markdown("#### Words that might rhyme:")
 
-                    # Get all unique words from the analyzed songs
-                    all_words = set()
-                    if songs_df is not None and not songs_df.empty:
-                        for song_data in results.get('processed_songs', []):
-                            if song_data and 'lyrics' in song_data:
-                                lyrics = song_data['lyrics']
-                                # Clean and extract words
-                                import re
-
-                                words_in_lyrics = re.findall(r'\b\w+\b', lyrics.lower())
-                                all_words.update(words_in_lyrics)
-
-                    # Find potential rhymes based on endings
-                    ending = rhyme_word[-2:] if len(rhyme_word) >= 2 else rhyme_word
-                    potential_rhymes = [word for word in all_words if
-                                        word.endswith(ending) and word != rhyme_word.lower()]
+                    # Ranked by rhyme strength, then by how often the word appears in the analyzed songs
+                    potential_rhymes = get_rhyme_index(results).rhymes(rhyme_word, limit=10)
 
                     # Display suggestions
                     if potential_rhymes:
-                        import random
-
-                        suggestions = random.sample(potential_rhymes, min(5, len(potential_rhymes)))
-                        for word in suggestions:
-                            st.markdown(f"- {word}")
+                        for word, strength in potential_rhymes:
+                            st.markdown(f"- {word} ({RHYME_STRENGTH_LABELS[strength]})")
                     else:
                         st.markdown("No rhyme suggestions found in the analyzed songs.")
 
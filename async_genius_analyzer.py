@@ -0,0 +1,448 @@
+# async_genius_analyzer.py - asyncio backend for the Genius Lyrics Analyzer
+
+import asyncio
+import re
+import aiohttp
+from bs4 import BeautifulSoup, NavigableString
+from lyricsgenius import Genius
+from lyricsgenius.utils import clean_str
+from genius_analyzer import GeniusLyricsAnalyzer
+from genius_cache import endpoint_ttl
+from request_scheduler import get_scheduler, parse_retry_after
+from instrumentation import Instrumentation, PhaseStats, span, request_phase, record_bytes
+from config import (ASYNC_MAX_CONCURRENT_REQUESTS, REQUEST_TIMEOUT, OUTPUT_FORMAT, DEDUPE_SONGS, DEDUPE_ALBUMS,
+                    MAX_WORKERS)
+
+API_ROOT = "https://api.genius.com/"
+PUBLIC_API_ROOT = "https://genius.com/api/"
+WEB_ROOT = "https://genius.com/"
+
+
+class GeniusSong:
+    """Song metadata and lyrics, exposing the attributes process_song reads from lyricsgenius songs"""
+
+    def __init__(self, body, lyrics=''):
+        self.id = body.get('id')
+        self.title = body.get('title', 'Unknown Title')
+        self.artist = body.get('primary_artist', {}).get('name', 'Unknown Artist')
+        self.album = (body.get('album') or {}).get('name', '')
+        self.release_date = body.get('release_date') or body.get('release_date_for_display') or ''
+        self.url = body.get('url', '')
+        self.lyrics = lyrics
+
+
+def parse_lyrics_page(page, remove_section_headers=True):
+    """Extract lyrics text from a Genius song page"""
+    soup = BeautifulSoup(page, "html.parser")
+    for header in soup.find_all("div", class_=re.compile("LyricsHeader")):
+        header.decompose()
+
+    containers = soup.find_all("div", attrs={"data-lyrics-container": "true"})
+    if not containers:
+        return ''
+
+    for br in soup.find_all("br"):
+        br.replace_with(NavigableString("\n"))
+
+    lyrics = ""
+    for container in containers:
+        if not container.contents:
+            lyrics += "\n"
+        for element in container.contents:
+            if isinstance(element, NavigableString):
+                lyrics += str(element)
+            elif element.get("data-exclude-from-selection") != "true":
+                lyrics += element.get_text()
+
+    # Remove [Verse], [Bridge], etc. the same way the sync client does
+    if remove_section_headers:
+        lyrics = re.sub(r"(\[.*?\])*", "", lyrics)
+        lyrics = re.sub("\n{2}", "\n", lyrics)
+    return lyrics.strip("\n")
+
+
+class AsyncGeniusClient:
+    """Pooled aiohttp client for the Genius endpoints the analyzer needs
+
+    Search results are chosen by the rules of a lyricsgenius Genius client
+    (genius), so both backends pick the same songs; no requests are made
+    through it.
+    """
+
+    def __init__(self, token, max_concurrency=ASYNC_MAX_CONCURRENT_REQUESTS, cache=None, scheduler=None,
+                 api_root=API_ROOT, public_api_root=PUBLIC_API_ROOT, web_root=WEB_ROOT,
+                 timeout=REQUEST_TIMEOUT, genius=None):
+        self.token = token
+        self.genius = genius or Genius(token, remove_section_headers=True)
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.scheduler = scheduler or get_scheduler()
+        self.api_root = api_root
+        self.public_api_root = public_api_root
+        self.web_root = web_root
+        self.timeout = timeout
+        self._session = None
+        self._slots = None
+        self._loop = None
+
+    async def __aenter__(self):
+        self._open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _open(self):
+        if self._session is None or self._session.closed:
+            self._loop = asyncio.get_running_loop()
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"application": "LyricsGenius"}
+            )
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+
+    async def aclose(self):
+        """Close the pooled HTTP session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def close(self):
+        """Close the pooled HTTP session from synchronous code, on the event loop that opened it"""
+        if self._session is None or self._session.closed:
+            return
+        loop = self._loop
+        if loop.is_running():
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is loop:
+                loop.create_task(self.aclose())  # Can't block the loop we're called from
+            else:
+                asyncio.run_coroutine_threadsafe(self.aclose(), loop).result()
+        elif not loop.is_closed():
+            loop.run_until_complete(self.aclose())
+        else:
+            asyncio.run(self.aclose())
+
+    async def _request(self, path, params=None, public_api=False, web=False):
+        """GET an endpoint, going through the response cache and the shared rate limiter"""
+        # Drop unset parameters the way requests does, so cache keys match the sync client
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+        endpoint = f"{'web' if web else 'public' if public_api else 'api'}:{path}"
+        with span(request_phase(path, web), path=path) as fields:
+            if self.cache is not None:
+                cached = self.cache.get(endpoint, params)
+                fields['cache'] = 'miss' if cached is None else 'hit'
+                if cached is not None:
+                    return cached
+            result = await self._fetch(path, params, public_api, web)
+
+        # _fetch raises for anything but a successful response, so only those are cached
+        if self.cache is not None:
+            self.cache.set(endpoint, params, result, ttl=endpoint_ttl(path, web))
+        return result
+
+    async def _fetch(self, path, params, public_api=False, web=False):
+        """GET an endpoint from Genius, retrying transient failures"""
+        if web:
+            url, headers = self.web_root + path, None
+        elif public_api:
+            url, headers = self.public_api_root + path, None
+        else:
+            url, headers = self.api_root + path, {"authorization": f"Bearer {self.token}"}
+
+        self._open()
+        attempt = 0
+        while True:
+            delay = 0
+            try:
+                async with self._slots:
+                    wait = self.scheduler.bucket.reserve()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    async with self._session.get(url, params=params, headers=headers) as response:
+                        if self.scheduler.should_retry(response.status, attempt):
+                            delay = self.scheduler.backoff_delay(
+                                attempt, parse_retry_after(response.headers.get('Retry-After')))
+                            if response.status == 429:
+                                self.scheduler.bucket.pause(delay)
+                                delay = 0
+                        else:
+                            # Error pages (404 and the like) must not come back, or be cached, as lyrics
+                            response.raise_for_status()
+                            if web:
+                                record_bytes(len(await response.read()))
+                                return {"html": await response.text()}
+                            record_bytes(len(await response.read()))
+                            data = await response.json(content_type=None)
+                            return data.get("response", data)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self.scheduler.max_retries:
+                    raise
+                delay = self.scheduler.backoff_delay(attempt)
+            attempt += 1
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    async def lyrics(self, song_url):
+        """Scrape the lyrics from a song page; a missing page (404) has no lyrics"""
+        path = song_url.replace(self.web_root, "").replace(WEB_ROOT, "")
+        try:
+            page = (await self._request(path, web=True))["html"]
+        except aiohttp.ClientResponseError as e:
+            if e.status == 404:
+                return ''
+            raise
+        return parse_lyrics_page(page, self.genius.remove_section_headers)
+
+    # Requests below use the same endpoints and parameters as the lyricsgenius
+    # methods they replace, so both backends share cache entries
+
+    async def song(self, song_id):
+        """Get full metadata for a song, like Genius.song"""
+        return (await self._request(f"songs/{song_id}", {"text_format": self.genius.response_format}))["song"]
+
+    async def search_all(self, search_term, per_page=None, page=None):
+        """Search every result type, like Genius.search_all"""
+        return await self._request("search/multi", {"q": search_term, "per_page": per_page, "page": page},
+                                   public_api=True)
+
+    async def search(self, search_term):
+        """Search songs on the public API, like Genius.search"""
+        return await self._request("search", {"q": search_term, "per_page": None, "page": None}, public_api=True)
+
+    async def _complete_song(self, song_info, get_full_info=True):
+        """Fetch lyrics (and full info) for a song search result concurrently"""
+        has_lyrics = song_info.get("lyrics_state") == "complete" and not song_info.get("instrumental")
+        tasks = [self.lyrics(song_info["url"]) if has_lyrics else asyncio.sleep(0, '')]
+        if get_full_info:
+            tasks.append(self.song(song_info["id"]))
+        results = await asyncio.gather(*tasks)
+        if get_full_info:
+            song_info = {**song_info, **results[1]}
+        return GeniusSong(song_info, results[0] or '')
+
+    async def search_song(self, title, artist=""):
+        """Search for a song and fetch its lyrics, picking the same result as Genius.search_song"""
+        genius = self.genius
+        search_term = f"{title} {artist}".strip()
+        song_info = genius._get_item_from_search_response(await self.search_all(search_term), title,
+                                                          type_="song", result_type="title", artist=artist)
+        if song_info is None:
+            # Fall back to the plain song search: a matching hit, else the first by the artist
+            hits = [hit["result"] for hit in (await self.search(search_term)).get("hits") or []]
+            song_info = next((result for result in hits if genius._result_is_match(result, title, artist)), None)
+            if song_info is None:
+                song_info = next((result for result in hits if "primary_artist" in result and "url" in result and
+                                  (not artist or clean_str(result["primary_artist"]["name"]) == clean_str(artist))),
+                                 None)
+        if song_info is None or (genius.skip_non_songs and not genius._result_is_lyrics(song_info)):
+            return None
+
+        song = await self._complete_song(song_info)
+        if genius.skip_non_songs and not song.lyrics:
+            return None
+        return song
+
+    async def _find_artist_id(self, artist_name, max_pages=10):
+        """The artist Genius.search_artist would pick: an exact name match, else the first candidate"""
+        genius = self.genius
+        best_candidate = None
+        for page in range(1, max_pages + 1):
+            response = await self.search_all(artist_name, per_page=genius.per_page, page=page)
+            section = next((section for section in response["sections"] if section["type"] == "artist"), None)
+            hit_count = len(section["hits"]) if section else 0
+            if not hit_count:
+                break
+            candidate = genius._get_item_from_search_response(response, artist_name, type_="artist",
+                                                              result_type="name")
+            if candidate and clean_str(candidate["name"]) == clean_str(artist_name):
+                return candidate["id"]
+            best_candidate = best_candidate or candidate
+            if hit_count < genius.per_page:
+                break
+        return best_candidate["id"] if best_candidate else None
+
+    async def search_artist_songs(self, artist_name, max_songs=10, sort="popularity", per_page=20):
+        """Find an artist and fetch lyrics for up to max_songs of their songs, like Genius.search_artist"""
+        artist_id = await self._find_artist_id(artist_name)
+        if not artist_id:
+            return []
+        artist = (await self._request(f"artists/{artist_id}", {"text_format": self.genius.response_format}))["artist"]
+
+        song_infos = []
+        page = 1
+        while page and len(song_infos) < max_songs:
+            response = await self._request(f"artists/{artist_id}/songs",
+                                           {"sort": sort, "per_page": per_page, "page": page})
+            for song_info in response["songs"]:
+                # Skip non-songs, and songs search_artist wouldn't add (features)
+                if self.genius.skip_non_songs and not self.genius._result_is_lyrics(song_info):
+                    continue
+                if song_info.get("primary_artist", {}).get("name") != artist["name"]:
+                    continue
+                song_infos.append(song_info)
+                if len(song_infos) >= max_songs:
+                    break
+            page = response.get("next_page")
+
+        songs = await asyncio.gather(*(self._complete_song(song_info) for song_info in song_infos))
+        return list(songs)
+
+    async def search_album(self, album_name, artist=""):
+        """Find an album and fetch lyrics for each of its tracks, like Genius.search_album"""
+        search_term = f"{album_name} {artist}".strip()
+        album = self.genius._get_item_from_search_response(await self.search_all(search_term), album_name,
+                                                           type_="album", result_type="name")
+        if album is None:
+            return []
+
+        song_infos = []
+        page = 1
+        while page:
+            response = await self._request(f"albums/{album['id']}/tracks",
+                                           {"per_page": 50, "page": page, "text_format": self.genius.response_format},
+                                           public_api=True)
+            song_infos.extend(track["song"] for track in response["tracks"])
+            page = response.get("next_page")
+
+        songs = await asyncio.gather(*(self._complete_song(song_info, get_full_info=False)
+                                       for song_info in song_infos))
+        return list(songs)
+
+    async def song_annotations(self, song_id):
+        """Return (fragment, [annotation bodies]) pairs for a song, like Genius.song_annotations"""
+        response = await self._request("referents", {"song_id": song_id, "web_page_id": None,
+                                                     "created_by_id": None, "per_page": None, "page": None,
+                                                     "text_format": self.genius.response_format})
+        return [
+            (referent["fragment"], [list(annotation["body"].values()) for annotation in referent["annotations"]])
+            for referent in response.get("referents", [])
+        ]
+
+
+class AsyncGeniusLyricsAnalyzer(GeniusLyricsAnalyzer):
+    """GeniusLyricsAnalyzer that fetches from Genius on an asyncio event loop
+
+    Analysis, tabulation, ranking and visualization are inherited; the
+    *_async methods replace the network-bound steps. The synchronous
+    methods (run_analysis, get_song, ...) keep working too, using max_workers
+    threads; both backends share the response cache.
+    """
+
+    def __init__(self, token, max_concurrency=ASYNC_MAX_CONCURRENT_REQUESTS, cache=None, nlp_processes=None,
+                 max_workers=MAX_WORKERS, **client_options):
+        super().__init__(token, max_workers=max_workers, cache=cache, nlp_processes=nlp_processes)
+        self.client = AsyncGeniusClient(token, max_concurrency=max_concurrency, cache=self.cache,
+                                        genius=self.genius, **client_options)
+
+    async def __aenter__(self):
+        await self.client.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the pooled HTTP sessions"""
+        await self.client.aclose()
+        super().close()
+
+    def close(self):
+        """Close the pooled HTTP sessions from synchronous code, e.g. when evicted by get_analyzer"""
+        self.client.close()
+        super().close()
+
+    async def process_song_async(self, song, status_callback=None):
+        """Async variant of process_song"""
+        if not song:
+            if status_callback:
+                status_callback("Song not found")
+            return None
+
+        if status_callback:
+            status_callback(f"Processing song: {song.title}")
+            status_callback(f"Getting annotations for: {song.title}")
+
+        with span('process_song', song_id=song.id, title=song.title):
+            annotations = await self.client.song_annotations(song.id)
+            song_data = self._build_song_data(song, annotations)
+            if self.nlp_engine is not None:
+                # Analyze in a worker process so the event loop keeps fetching
+                future = self.nlp_engine.submit([song_data])
+                (complexity, top_words, start, duration), = await asyncio.wrap_future(future)
+                song_data['complexity'] = complexity
+                song_data['top_words'] = top_words
+                self._record_nlp_timing(song_data, start, duration)
+            else:
+                # CPU-bound, so keep it off the event loop while other songs are fetched
+                await asyncio.to_thread(self._analyze_in_process, song_data, status_callback)
+        return song_data
+
+    async def _process_songs_async(self, songs, status_callback=None):
+        """Process songs concurrently, preserving input order"""
+        results = await asyncio.gather(*(self.process_song_async(song, status_callback) for song in songs))
+        return [song_data for song_data in results if song_data]
+
+    async def run_analysis_async(self, artist_name, album_name=None, song_name=None, max_songs=10,
+                                 status_callback=None, save_files=False, weights=None,
+                                 output_format=OUTPUT_FORMAT, visualize=True, instrument=None,
+                                 dedupe=DEDUPE_SONGS):
+        """Async variant of run_analysis, returning the same result dictionary"""
+        phase_stats = PhaseStats()
+        with Instrumentation(phase_stats, instrument).activate():
+            results = await self._run_analysis_async(artist_name, album_name, song_name, max_songs,
+                                                     status_callback, save_files, weights, output_format,
+                                                     visualize, dedupe)
+        results['timings'] = phase_stats.summary()
+        return results
+
+    async def _run_analysis_async(self, artist_name, album_name, song_name, max_songs, status_callback,
+                                  save_files, weights, output_format, visualize, dedupe):
+        processed_songs = []
+        duplicates = []
+
+        if album_name:
+            if status_callback:
+                status_callback(f"Analyzing album '{album_name}' by {artist_name}...")
+
+            with span('find_songs'):
+                songs = await self.client.search_album(album_name, artist_name)
+            if songs:
+                if dedupe and DEDUPE_ALBUMS:
+                    songs, duplicates = self._dedupe_songs(songs, status_callback)
+                processed_songs = await self._process_songs_async(songs, status_callback)
+            elif status_callback:
+                status_callback(f"Album '{album_name}' not found or has no tracks")
+
+        elif song_name:
+            if status_callback:
+                status_callback(f"Analyzing song '{song_name}' by {artist_name}...")
+
+            with span('find_songs'):
+                song = await self.client.search_song(song_name, artist_name)
+            if song:
+                processed_songs = await self._process_songs_async([song], status_callback)
+            elif status_callback:
+                status_callback(f"Song '{song_name}' not found")
+
+        else:
+            if status_callback:
+                status_callback(f"Analyzing top {max_songs} songs by {artist_name}...")
+
+            with span('find_songs'):
+                songs = await self.client.search_artist_songs(artist_name, max_songs=max_songs)
+            if songs:
+                if dedupe:
+                    songs, duplicates = self._dedupe_songs(songs, status_callback)
+                processed_songs = await self._process_songs_async(songs, status_callback)
+            elif status_callback:
+                status_callback(f"No songs found for artist: {artist_name}")
+
+        results = self._finalize_analysis(artist_name, processed_songs, status_callback, save_files, weights,
+                                          output_format, visualize)
+        results['duplicates'] = duplicates
+        return results
@@ -0,0 +1,254 @@
+# batch_analyzer.py - Unattended analysis of a manifest of artists, albums and songs
+#
+# Usage: python batch_analyzer.py manifest.csv --out batch_results [--jobs 2] [--format parquet]
+#
+# The manifest is a CSV (or JSON Lines) file with an `artist` column and optional
+# `album`, `song` and `max_songs` columns; each row is analyzed like the app does.
+# Every finished item is appended to <out>/checkpoint.jsonl, so rerunning the same
+# command after a crash or Ctrl-C skips work that is already done.
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import GENIUS_API_TOKEN, MAX_TOP_SONGS, OUTPUT_FORMAT, ANNOTATION_INDEX_PATH, NLP_PROCESSES
+from annotation_index import AnnotationIndex
+from exports import OUTPUT_FORMATS, write_table, output_path
+
+CHECKPOINT_FILE = "checkpoint.jsonl"
+
+# Items analyzed at once; requests are still paced by the shared rate limiter
+DEFAULT_JOBS = 2
+
+
+def read_manifest(path, default_max_songs=MAX_TOP_SONGS):
+    """Read manifest rows into item dicts with artist, album, song and max_songs keys
+
+    .jsonl files hold one JSON object per line, .json files a JSON array of
+    objects; anything else is read as CSV.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            rows = [json.loads(line) for line in f if line.strip()]
+        elif path.endswith('.json'):
+            rows = json.load(f)
+            if not isinstance(rows, list):
+                raise ValueError(f"{path}: expected a JSON array of items")
+        else:
+            rows = list(csv.DictReader(f))
+
+    items = []
+    for line_number, row in enumerate(rows, start=1):
+        row = {str(key).strip().lower(): (str(value).strip() if value is not None else '')
+               for key, value in row.items() if key is not None}
+        if not row.get('artist'):
+            raise ValueError(f"{path}: row {line_number} has no artist")
+        items.append({
+            'artist': row['artist'],
+            'album': row.get('album') or None,
+            'song': row.get('song') or None,
+            'max_songs': int(row.get('max_songs') or default_max_songs),
+        })
+    return items
+
+
+def item_key(item):
+    """Stable identifier for a manifest item, used to match it against the checkpoint"""
+    payload = json.dumps([item['artist'].lower(), (item['album'] or '').lower(), (item['song'] or '').lower(),
+                          item['max_songs'] if not (item['album'] or item['song']) else None])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+
+
+def item_label(item):
+    """Human-readable description of a manifest item"""
+    if item['album']:
+        return f"album '{item['album']}' by {item['artist']}"
+    if item['song']:
+        return f"song '{item['song']}' by {item['artist']}"
+    return f"top {item['max_songs']} songs by {item['artist']}"
+
+
+class Checkpoint:
+    """Append-only JSON Lines log of finished items; the latest record for each key wins"""
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # A line cut short by a crash
+                    self.records[record['key']] = record
+
+    def is_done(self, key):
+        return self.records.get(key, {}).get('status') == 'done'
+
+    def record(self, key, status, **fields):
+        """Durably append a record for an item"""
+        record = {'key': key, 'status': status, 'finished_at': time.time(), **fields}
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.records[key] = record
+        return record
+
+
+def _write_atomic(df, path, output_format):
+    """Write a table via a temporary file so a crash never leaves a partial output behind"""
+    temporary = write_table(df, path + ".tmp", output_format)
+    final = output_path(path, output_format)
+    os.replace(temporary, final)
+    return final
+
+
+def _slug(text):
+    return re.sub(r'[^A-Za-z0-9]+', '_', text).strip('_')[:60] or 'item'
+
+
+def analyze_item(analyzer, item, out_dir, output_format=OUTPUT_FORMAT, status_callback=None, index=None):
+    """Analyze one manifest item and write its song and annotation tables; returns checkpoint fields
+
+    If an AnnotationIndex is given, the item's annotations are added to it.
+    """
+    results = analyzer.run_analysis(item['artist'], album_name=item['album'], song_name=item['song'],
+                                    max_songs=item['max_songs'], status_callback=status_callback,
+                                    visualize=False)
+    if index is not None:
+        index.add_songs(results['processed_songs'])
+
+    base = os.path.join(out_dir, f"{_slug(item['artist'])}_{item_key(item)}")
+    fields = {'item': item, 'song_count': len(results['processed_songs'])}
+    if not results['songs_df'].empty:
+        fields['songs_file'] = _write_atomic(results['songs_df'], base + "_songs", output_format)
+    if not results['annotations_df'].empty:
+        fields['annotations_file'] = _write_atomic(results['annotations_df'], base + "_annotations",
+                                                   output_format)
+    return fields
+
+
+def run_batch(items, out_dir, token=GENIUS_API_TOKEN, jobs=DEFAULT_JOBS, output_format=OUTPUT_FORMAT,
+              retry_failed=True, status_callback=print, analyzer=None, index=None, nlp_processes=None):
+    """Analyze manifest items with at most `jobs` in flight, skipping items already checkpointed
+
+    nlp_processes sets the analyzer's NLP worker processes (default NLP_PROCESSES).
+    Returns counts of items that were done, failed and skipped in this run.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    checkpoint = Checkpoint(os.path.join(out_dir, CHECKPOINT_FILE))
+    counts = {'done': 0, 'failed': 0, 'skipped': 0}
+
+    pending = {}
+    for item in items:
+        key = item_key(item)
+        if key in pending or checkpoint.is_done(key) or \
+                (not retry_failed and checkpoint.records.get(key, {}).get('status') == 'failed'):
+            counts['skipped'] += 1
+        else:
+            pending[key] = item
+    if status_callback:
+        status_callback(f"{len(pending)} items to analyze, {counts['skipped']} already done or duplicated")
+    if not pending:
+        return counts
+
+    if analyzer is None:
+        from genius_analyzer import get_analyzer
+        options = {} if nlp_processes is None else {'nlp_processes': nlp_processes}
+        analyzer = get_analyzer(token, **options)
+
+    def process(key, item):
+        # Checkpoint from the worker so items that finish while shutting down are kept
+        try:
+            fields = analyze_item(analyzer, item, out_dir, output_format, index=index)
+        except Exception as e:
+            return checkpoint.record(key, 'failed', item=item, error=f"{type(e).__name__}: {e}")
+        return checkpoint.record(key, 'done', **fields)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, jobs))
+    try:
+        futures = [executor.submit(process, key, item) for key, item in pending.items()]
+        for finished, future in enumerate(as_completed(futures), start=1):
+            record = future.result()
+            counts[record['status']] += 1
+            if status_callback:
+                outcome = f"{record['song_count']} songs" if record['status'] == 'done' \
+                    else f"failed ({record['error']})"
+                status_callback(f"[{finished}/{len(pending)}] {item_label(record['item'])}: {outcome}")
+    finally:
+        # On Ctrl-C, drop queued items and let running ones finish and checkpoint
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return counts
+
+
+def load_batch_results(out_dir, table='songs'):
+    """Concatenate the 'songs' or 'annotations' tables of every finished item in a batch directory"""
+    import pandas as pd
+    from exports import load_table
+
+    checkpoint = Checkpoint(os.path.join(out_dir, CHECKPOINT_FILE))
+    frames = []
+    for record in checkpoint.records.values():
+        path = record.get(f"{table}_file")
+        if record['status'] == 'done' and path:
+            frames.append(load_table(path).assign(batch_key=record['key']))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a manifest of artists, albums and songs")
+    parser.add_argument("manifest", help="CSV or JSON Lines file with artist[, album, song, max_songs] columns")
+    parser.add_argument("--out", default="batch_results", help="Directory for results and the checkpoint")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="Items analyzed concurrently")
+    parser.add_argument("--format", default=OUTPUT_FORMAT, choices=list(OUTPUT_FORMATS),
+                        help="Format of the saved tables")
+    parser.add_argument("--max-songs", type=int, default=MAX_TOP_SONGS,
+                        help="Songs per artist when the manifest doesn't say")
+    parser.add_argument("--token", default=os.environ.get("GENIUS_API_TOKEN") or GENIUS_API_TOKEN,
+                        help="Genius API token (defaults to GENIUS_API_TOKEN)")
+    parser.add_argument("--skip-failed", action="store_true", help="Don't retry items that failed in earlier runs")
+    parser.add_argument("--index", nargs="?", const=ANNOTATION_INDEX_PATH,
+                        help="Add annotations to a searchable index (default path: ANNOTATION_INDEX_PATH)")
+    parser.add_argument("--nlp-processes", type=int, default=NLP_PROCESSES,
+                        help="Worker processes for lyrics analysis; 0 or 1 analyzes on the fetch threads")
+    parser.add_argument("--no-nltk-download", action="store_true",
+                        help="Fail up front if NLTK data is missing instead of downloading it")
+    args = parser.parse_args(argv)
+
+    if not args.token:
+        parser.error("no Genius API token; pass --token or set GENIUS_API_TOKEN")
+    if args.no_nltk_download:
+        from genius_analyzer import MissingNLTKDataError, ensure_nltk_data
+
+        try:
+            ensure_nltk_data(auto_download=False)
+        except MissingNLTKDataError as e:
+            parser.error(str(e))
+
+    items = read_manifest(args.manifest, default_max_songs=args.max_songs)
+    index = AnnotationIndex(args.index) if args.index else None
+    try:
+        counts = run_batch(items, args.out, token=args.token, jobs=args.jobs, output_format=args.format,
+                           retry_failed=not args.skip_failed, index=index, nlp_processes=args.nlp_processes)
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume", file=sys.stderr)
+        return 130
+
+    print(f"Done: {counts['done']} analyzed, {counts['failed']} failed, {counts['skipped']} skipped")
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+# import_time.py - Measure cold import time of the analyzer modules
+#
+# Usage: python benchmarks/import_time.py [--runs 5] [--module genius_analyzer]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_import(module):
+    """Import a module in a fresh interpreter and return the wall-clock seconds taken"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=ROOT, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def heaviest_imports(module, top=10):
+    """Return the direct dependencies of a module with the largest cumulative import time"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                            check=True, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # -X importtime indents each nesting level by two spaces after a leading space
+        if len(name) - len(name.lstrip()) == 3:
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold import time")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time per module")
+    parser.add_argument("--module", action="append", help="Module to import (repeatable)")
+    args = parser.parse_args()
+
+    baseline = statistics.median(time_import("sys") for _ in range(args.runs))
+    print(f"Interpreter startup: {baseline * 1000:.0f} ms (subtracted below)")
+
+    for module in args.module or ["genius_analyzer"]:
+        timings = [time_import(module) - baseline for _ in range(args.runs)]
+        print(f"\nimport {module}: median {statistics.median(timings) * 1000:.0f} ms, "
+              f"min {min(timings) * 1000:.0f} ms over {args.runs} runs")
+        print("Heaviest direct imports (cumulative):")
+        for microseconds, name in heaviest_imports(module):
+            print(f"  {microseconds / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+# pipeline.py - Offline benchmark of the analysis pipeline, stage by stage
+#
+# Usage: python benchmarks/pipeline.py [--scales 10,1000,100000] [--no-memory] [--nlp-processes 4]
+#                                     [--json results.json]
+#
+# The default scales finish in a few minutes; 100000 songs takes much longer,
+# mostly in sentiment scoring.
+#
+# Songs come from a seeded synthetic corpus and Genius requests are answered from
+# the fixtures in benchmarks/fixtures, so no network access or API token is needed.
+# NLTK data (vader_lexicon, stopwords) must be installed.
+
+import argparse
+import copy
+import gc
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+sys.path.insert(0, ROOT)
+
+DEFAULT_SCALES = (10, 1000)
+
+# Corpus shape, roughly matching Genius songs: lines per song, words per line,
+# and how many lines carry annotations
+LINES_PER_SONG = (30, 70)
+WORDS_PER_LINE = (5, 11)
+ANNOTATIONS_PER_SONG = (0, 12)
+VOCABULARY_SIZE = 20000
+
+SECTION_HEADERS = ["[Intro]", "[Verse 1]", "[Chorus]", "[Verse 2]", "[Bridge]", "[Outro]"]
+
+# Frequent words so sentiment, stop word filtering and top words see realistic text
+COMMON_WORDS = ("i you the a to and me my it in that love we on for your know all like be not is "
+                "so but with this what just night baby feel heart time never way got gonna money "
+                "good bad pain happy cry dream fire light dark life die free lost home").split()
+
+
+def synthetic_vocabulary(size=VOCABULARY_SIZE, seed=0):
+    """Pseudo-words, in rank order, to sample from with a Zipf-like distribution"""
+    rng = random.Random(seed)
+    syllables = ["ka", "lo", "mi", "ra", "tes", "on", "vi", "du", "shan", "el", "ry", "po", "quin", "zo", "ber"]
+    invented = ["".join(parts) for length in (2, 3, 4) for parts in itertools.product(syllables, repeat=length)]
+    rng.shuffle(invented)
+    words = list(dict.fromkeys(COMMON_WORDS + invented))
+    return words[:size]
+
+
+def synthetic_corpus(count, seed=0):
+    """Generate `count` songs shaped like lyricsgenius Song objects (id, title, artist, album, lyrics)"""
+    rng = random.Random(seed)
+    vocabulary = synthetic_vocabulary(seed=seed)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    albums = [f"Album {i}" for i in range(max(1, count // 12))]
+
+    songs = []
+    for song_id in range(1, count + 1):
+        lines = []
+        for line_number in range(rng.randint(*LINES_PER_SONG)):
+            if line_number % 8 == 0:
+                lines.append(SECTION_HEADERS[(line_number // 8) % len(SECTION_HEADERS)])
+            words = rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(*WORDS_PER_LINE))
+            lines.append(" ".join(words).capitalize())
+        songs.append(SimpleNamespace(
+            id=song_id,
+            title=f"Song {song_id}",
+            artist=f"Artist {song_id % 50}",
+            album=rng.choice(albums),
+            release_date=f"20{rng.randint(0, 24):02d}-01-01",
+            lyrics="\n".join(lines),
+        ))
+    return songs
+
+
+class FixtureResponder:
+    """Answers Genius requests offline: referents come from the recorded fixture, with
+    fragments taken from the requesting song's lyrics so annotations line up with the text"""
+
+    def __init__(self, songs, seed=0):
+        with open(os.path.join(FIXTURES, "referents.json"), encoding="utf-8") as f:
+            self.referents = json.load(f)["response"]["referents"]
+        self.songs = {song.id: song for song in songs}
+        self.seed = seed
+
+    def __call__(self, path, method='GET', params_=None, public_api=False, web=False, **kwargs):
+        if path != "referents":
+            raise KeyError(f"No fixture for {path}")
+        song = self.songs[params_["song_id"]]
+        rng = random.Random(self.seed + song.id)
+        lines = [line for line in song.lyrics.split("\n") if line and not line.startswith("[")]
+        referents = []
+        for i in range(min(rng.randint(*ANNOTATIONS_PER_SONG), len(lines))):
+            referent = copy.deepcopy(self.referents[i % len(self.referents)])
+            referent["fragment"] = lines[rng.randrange(len(lines))]
+            referent["song_id"] = song.id
+            referents.append(referent)
+        return {"referents": referents}
+
+
+def measure(label, function, track_memory=True):
+    """Run one stage, returning its result and a row with seconds and peak traced memory (MB)"""
+    gc.collect()
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    peak = None
+    if track_memory:
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return result, {'stage': label, 'seconds': seconds, 'peak_mb': peak}
+
+
+def warm_up():
+    """Load lazily imported libraries and NLTK data so the first stage measured doesn't pay for them"""
+    from genius_analyzer import ensure_nltk_data, get_sentiment_analyzer, get_stop_words
+    import matplotlib.pyplot  # noqa: F401
+    import pandas  # noqa: F401
+
+    ensure_nltk_data()
+    get_sentiment_analyzer()
+    get_stop_words()
+
+
+def benchmark_scale(count, seed=0, track_memory=True, full_run_limit=1000, nlp_processes=0):
+    """Benchmark every pipeline stage on a synthetic corpus of `count` songs
+
+    nlp_processes > 1 adds a stage analyzing the songs on an NLP process pool of that size.
+    """
+    from genius_analyzer import GeniusLyricsAnalyzer
+    from charts import clear_chart_cache
+
+    warm_up()
+    songs = synthetic_corpus(count, seed)
+    analyzer = GeniusLyricsAnalyzer("offline-benchmark", cache=False)
+    analyzer.genius._make_request = FixtureResponder(songs, seed)
+    rows = []
+
+    def stage(label, function):
+        result, row = measure(label, function, track_memory)
+        row['songs'] = count
+        rows.append(row)
+        return result
+
+    processed = stage("process_song", lambda: [analyzer.process_song(song) for song in songs])
+    complexities = stage("analyze_song_complexity",
+                         lambda: [analyzer.analyze_song_complexity(song_data) for song_data in processed])
+    for song_data, complexity in zip(processed, complexities):
+        song_data['complexity'] = complexity
+    stage("get_top_words", lambda: [analyzer.get_top_words(song_data) for song_data in processed])
+    pool_analyzer = None
+    if nlp_processes > 1:
+        pool_analyzer = GeniusLyricsAnalyzer("offline-benchmark", cache=False, nlp_processes=nlp_processes)
+        pool_analyzer.genius._make_request = analyzer.genius._make_request
+        pool_analyzer.nlp_engine.map(processed[:nlp_processes])  # Start the workers outside the measurement
+        # Complexity and top words together, so compare with the two stages above
+        stage(f"analyze_songs ({nlp_processes} processes)", lambda: pool_analyzer.analyze_songs(processed))
+    songs_df = stage("create_song_dataframe", lambda: analyzer.create_song_dataframe(processed))
+    stage("create_annotations_dataframe", lambda: analyzer.create_annotations_dataframe(processed))
+    ranked_songs = stage("rank_songs_by_complexity", lambda: analyzer.rank_songs_by_complexity(songs_df))
+    clear_chart_cache()  # Measure a render, not a cache hit
+    stage("visualize_song_complexity", lambda: analyzer.visualize_song_complexity(ranked_songs))
+
+    # End to end, including the worker pool, on fresh copies of the songs
+    if count <= full_run_limit:
+        fresh_songs = synthetic_corpus(count, seed)
+        analyzer.get_artist_songs = lambda artist_name, max_songs=10: fresh_songs
+        clear_chart_cache()
+        stage("run_analysis (end to end)", lambda: analyzer.run_analysis("Benchmark Artist", max_songs=count))
+        if pool_analyzer is not None:
+            pool_songs = synthetic_corpus(count, seed)
+            pool_analyzer.get_artist_songs = lambda artist_name, max_songs=10: pool_songs
+            clear_chart_cache()
+            stage(f"run_analysis ({nlp_processes} processes)",
+                  lambda: pool_analyzer.run_analysis("Benchmark Artist", max_songs=count))
+    if pool_analyzer is not None:
+        pool_analyzer.nlp_engine.close()
+    return rows
+
+
+def print_rows(rows):
+    print(f"{'songs':>7}  {'stage':<30}{'seconds':>10}{'songs/s':>12}{'peak MB':>10}")
+    for row in rows:
+        rate = row['songs'] / row['seconds'] if row['seconds'] > 0 else float('inf')
+        peak = f"{row['peak_mb']:.1f}" if row['peak_mb'] is not None else "-"
+        print(f"{row['songs']:>7}  {row['stage']:<30}{row['seconds']:>10.3f}{rate:>12.0f}{peak:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline offline")
+    parser.add_argument("--scales", default=",".join(str(scale) for scale in DEFAULT_SCALES),
+                        help="Comma-separated corpus sizes")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic corpus")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip tracemalloc, which slows the stages down, for cleaner timings")
+    parser.add_argument("--full-run-limit", type=int, default=1000,
+                        help="Largest corpus to also run through run_analysis end to end")
+    parser.add_argument("--nlp-processes", type=int, default=0,
+                        help="Also time analysis on an NLP process pool of this many workers")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    all_rows = []
+    for scale in (int(value) for value in args.scales.split(",")):
+        rows = benchmark_scale(scale, seed=args.seed, track_memory=not args.no_memory,
+                               full_run_limit=args.full_run_limit, nlp_processes=args.nlp_processes)
+        print_rows(rows)
+        print()
+        all_rows.extend(rows)
+
+    if not args.no_memory:
+        print("Timings include tracemalloc overhead; use --no-memory for undistorted timings.")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(all_rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# song_memory.py - Memory per processed song: plain dicts vs SongRecords
+#
+# Usage: python benchmarks/song_memory.py [--songs 1000]
+#
+# Songs are processed offline as in pipeline.py and their in-memory size is
+# measured by walking every object they reference, counting objects shared
+# between songs (interned strings, for example) once.
+
+import argparse
+import sys
+from array import array
+
+from pipeline import FixtureResponder, synthetic_corpus, warm_up
+
+
+def deep_size(root):
+    """Total sys.getsizeof of root and every object reachable from it, each counted once"""
+    seen = set()
+    total = 0
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, (str, bytes, int, float, bool, array)) or obj is None:
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        else:
+            for cls in type(obj).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    if hasattr(obj, slot):
+                        stack.append(getattr(obj, slot))
+            if hasattr(obj, '__dict__'):
+                stack.append(obj.__dict__)
+    return total
+
+
+def processed_songs(count, seed=0):
+    """Process a synthetic corpus the way run_analysis does"""
+    from genius_analyzer import GeniusLyricsAnalyzer
+
+    songs = synthetic_corpus(count, seed)
+    analyzer = GeniusLyricsAnalyzer("offline-benchmark", cache=False)
+    analyzer.genius._make_request = FixtureResponder(songs, seed)
+    processed = [analyzer.process_song(song) for song in songs]
+    for song_data in processed:
+        song_data['complexity'] = analyzer.analyze_song_complexity(song_data)
+    return processed
+
+
+def main():
+    from song_records import SongRecord
+
+    parser = argparse.ArgumentParser(description="Compare the memory used per song by dicts and SongRecords")
+    parser.add_argument("--songs", type=int, default=1000, help="Number of synthetic songs")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic corpus")
+    args = parser.parse_args()
+
+    warm_up()
+    songs = processed_songs(args.songs, args.seed)
+    representations = [
+        ("dict", songs),
+        ("SongRecord", SongRecord.from_songs(songs, compress=False)),
+        ("SongRecord (compressed text)", SongRecord.from_songs(songs, compress=True)),
+    ]
+
+    baseline = None
+    print(f"{'representation':<32}{'bytes/song':>12}{'vs dict':>10}")
+    for label, song_list in representations:
+        per_song = deep_size(song_list) / len(song_list)
+        baseline = baseline or per_song
+        print(f"{label:<32}{per_song:>12,.0f}{per_song / baseline:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# charts.py - In-memory rendering of the complexity charts
+#
+# Charts are drawn on a standalone matplotlib Figure with the Agg canvas (no
+# pyplot global state, so rendering is headless and safe from worker threads)
+# and returned as image bytes. Rendered images are cached by a hash of the
+# plotted data and render options, so Streamlit reruns and repeat analyses
+# reuse them instead of drawing again.
+
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from config import CHART_CACHE_SIZE
+
+# Columns of the ranked songs table that the chart draws
+CHART_COLUMNS = ['title', 'complexity_score', 'norm_lexical_diversity', 'norm_annotation_density']
+
+
+def chart_cache_key(ranked_songs, top_n=10, image_format='png', dpi=100):
+    """Hash the rows and options that determine the rendered chart"""
+    import pandas as pd
+
+    top_songs = ranked_songs.head(top_n)[CHART_COLUMNS]
+    digest = hashlib.sha256(pd.util.hash_pandas_object(top_songs, index=False).to_numpy().tobytes())
+    digest.update(repr((top_n, image_format, dpi)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def render_complexity_chart(ranked_songs, top_n=10, image_format='png', dpi=100):
+    """Draw the complexity score bar chart and diversity/density scatter plot and return the image bytes"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    # Limit to top N songs
+    top_songs = ranked_songs.head(min(top_n, len(ranked_songs)))
+
+    # Create figure with subplots
+    fig = Figure(figsize=(12, 10))
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(2, 1)
+
+    # Plot 1: Complexity Score
+    top_songs.plot(x='title', y='complexity_score', kind='bar', ax=axes[0],
+                   title='Song Complexity Scores', color='skyblue')
+    axes[0].set_xlabel('Song')
+    axes[0].set_ylabel('Complexity Score')
+    axes[0].set_xticklabels(top_songs['title'], rotation=45, ha='right')
+
+    # Plot 2: Lexical Diversity vs Annotation Density
+    axes[1].scatter(top_songs['norm_lexical_diversity'], top_songs['norm_annotation_density'], s=100, alpha=0.7)
+
+    # Add labels for each point
+    for _, row in top_songs.iterrows():
+        axes[1].annotate(row['title'],
+                         (row['norm_lexical_diversity'], row['norm_annotation_density']),
+                         xytext=(5, 5), textcoords='offset points')
+
+    axes[1].set_xlabel('Lexical Diversity (normalized)')
+    axes[1].set_ylabel('Annotation Density (normalized)')
+    axes[1].set_title('Lexical Diversity vs Annotation Density')
+    axes[1].grid(True, alpha=0.3)
+
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=image_format, dpi=dpi)
+    return buffer.getvalue()
+
+
+class ChartCache:
+    """Thread-safe LRU cache of rendered chart bytes"""
+
+    def __init__(self, max_entries=CHART_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+            return image
+
+    def set(self, key, image):
+        with self._lock:
+            self._entries[key] = image
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_chart_cache = ChartCache()
+
+
+def clear_chart_cache():
+    """Drop every cached chart image"""
+    _chart_cache.clear()
+
+
+def complexity_chart(ranked_songs, top_n=10, image_format='png', dpi=100, cache=_chart_cache):
+    """Return the complexity chart for ranked songs as image bytes, rendering it only on a cache miss"""
+    key = chart_cache_key(ranked_songs, top_n, image_format, dpi)
+    image = cache.get(key) if cache is not None else None
+    if image is None:
+        image = render_complexity_chart(ranked_songs, top_n, image_format, dpi)
+        if cache is not None:
+            cache.set(key, image)
+    return image
@@ -1,19 +1,106 @@
 # config.py - Configuration for Genius Lyrics Analyzer
 
-import streamlit as st
+import os
+import sys
+from types import MappingProxyType
 
-# Try to get token from Streamlit secrets first, then fall back to hardcoded value
+# Try to get token from Streamlit secrets first, then fall back to hardcoded value.
+# Streamlit is only consulted when it is already loaded (i.e. inside the app), so
+# CLI and batch workers don't pay for importing it.
 try:
-    GENIUS_API_TOKEN = st.secrets["GENIUS_API_TOKEN"]
+    GENIUS_API_TOKEN = sys.modules["streamlit"].secrets["GENIUS_API_TOKEN"]
 except:
     # Fallback for local development
-    GENIUS_API_TOKEN = "your_token"  # Replace with your token for local testing
+    GENIUS_API_TOKEN = os.environ.get("GENIUS_API_TOKEN", "your_token")  # Replace with your token for local testing
 
 # Maximum number of songs to analyze by default
 MAX_TOP_SONGS = 10
 
-# Analysis weights
-WEIGHTS = {
+# Maximum number of songs fetched and analyzed concurrently (1 = sequential)
+MAX_WORKERS = 8
+
+# Songs sent to each process pool worker at a time for batch sentiment scoring
+SENTIMENT_CHUNKSIZE = 64
+
+# Tokenized lyrics kept for the most recently analyzed songs, so each song's metrics share one tokenization
+TOKEN_CACHE_SIZE = 256
+
+# Worker processes for the CPU-bound per-song analysis (cleaning, sentiment, top words).
+# 0 or 1 runs it on the fetch threads; use the number of cores for bulk jobs
+NLP_PROCESSES = 0
+NLP_CHUNKSIZE = 32  # Most songs sent to a worker at a time
+
+# Download missing NLTK data automatically on first use. When off (GENIUS_NLTK_AUTO_DOWNLOAD=0, or
+# batch_analyzer.py --no-nltk-download), a missing resource raises an error with install instructions
+# instead of touching the network.
+NLTK_AUTO_DOWNLOAD = os.environ.get("GENIUS_NLTK_AUTO_DOWNLOAD", "1") != "0"
+
+# Number of analyzers (one per API token) kept alive and shared between sessions
+ANALYZER_POOL_SIZE = 16
+
+# Format for files saved by run_analysis(save_files=True): 'csv', 'parquet' or 'feather'.
+# The columnar formats (which need pyarrow) are much smaller and faster to reload
+OUTPUT_FORMAT = 'csv'
+
+# Keep finished songs as compact SongRecords (see song_records.py) instead of dicts,
+# which matters when many app sessions hold results at once. Compressing the
+# lyrics and annotations saves the most memory but costs a little time on every access
+COMPACT_SONG_RECORDS = True
+COMPRESS_SONG_TEXT = True
+
+# Skip remixes, live versions, translations and other near-duplicates of a song
+# before fetching annotations (see dedupe.py). Album track lists are left alone
+# unless DEDUPE_ALBUMS is set, since a reprise or alternate take there is deliberate
+DEDUPE_SONGS = True
+DEDUPE_ALBUMS = False
+DEDUPE_SIMILARITY = 0.8  # Estimated lyrics Jaccard similarity above which two songs are the same
+DEDUPE_TITLE_SIMILARITY = 0.3  # Lyrics similarity also required of matching titles when both have lyrics
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16  # Bands of MINHASH_PERMUTATIONS / LSH_BANDS rows; more bands find less similar pairs
+
+# Rendered chart images kept in memory, keyed by the plotted data
+CHART_CACHE_SIZE = 64
+
+# Persistent response cache for Genius API calls
+CACHE_ENABLED = True
+CACHE_PATH = os.environ.get(
+    "GENIUS_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "genius_scrape", "responses.sqlite3")
+)
+CACHE_MAX_BYTES = 500 * 1024 * 1024  # Least recently used entries are evicted past this size
+
+# Persistent full-text index of analyzed annotations (see annotation_index.py).
+# When enabled, the app adds every analyzed song to it and searches across all of them
+ANNOTATION_INDEX_ENABLED = False
+ANNOTATION_INDEX_PATH = os.environ.get(
+    "GENIUS_INDEX_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "genius_scrape", "annotations.sqlite3")
+)
+
+# Request pacing shared by every analyzer in the process
+REQUEST_RATE = 10  # Sustained requests per second to Genius
+REQUEST_BURST = 10  # Requests allowed back-to-back before pacing kicks in
+MAX_CONCURRENT_REQUESTS = 8  # Open connections to Genius at any time
+MAX_REQUEST_RETRIES = 4  # Retries for 429/5xx responses, timeouts and connection errors
+RETRY_BACKOFF_BASE = 0.5  # Seconds; doubled on every retry and jittered
+RETRY_BACKOFF_MAX = 30
+REQUEST_TIMEOUT = 10  # Seconds before a request is abandoned and retried
+ASYNC_MAX_CONCURRENT_REQUESTS = 100  # In-flight requests for the asyncio backend
+
+# How long cached responses stay fresh, in seconds, by endpoint
+CACHE_DEFAULT_TTL = 24 * 60 * 60
+CACHE_TTLS = {
+    'search': 24 * 60 * 60,  # Search results change as new songs are added
+    'songs': 7 * 24 * 60 * 60,
+    'artists': 7 * 24 * 60 * 60,
+    'albums': 7 * 24 * 60 * 60,
+    'referents': 24 * 60 * 60,  # Annotations are edited frequently
+    'lyrics': 30 * 24 * 60 * 60,  # Scraped lyrics pages
+}
+
+# Default analysis weights. Read-only: pass per-request weights to the ranking
+# functions (see scoring.ScoringWeights) instead of changing these at runtime
+WEIGHTS = MappingProxyType({
     'lexical_diversity': 0.7,
     'annotation_density': 0.3,
-}
+})
@@ -0,0 +1,188 @@
+# dedupe.py - Detect near-duplicate songs before their annotations are fetched
+#
+# Artist searches often return the same track several times: remixes, live and
+# remastered versions, radio edits and translated pages. Two songs are treated
+# as duplicates when:
+#   - their titles are the same once version qualifiers such as "(Live)" or
+#     "- Remastered 2011" are removed, at least one of them had such a
+#     qualifier and, if both have lyrics, the lyrics are at least somewhat
+#     alike (a "(Live)" cover of another song with the same name is kept); or
+#   - their lyrics are nearly identical.
+# Lyrics similarity is estimated with MinHash signatures of word shingles.
+# Locality-sensitive hashing (LSH) on bands of each signature means songs are
+# only compared with likely matches, not with every other song.
+
+import re
+import zlib
+from config import DEDUPE_SIMILARITY, DEDUPE_TITLE_SIMILARITY, MINHASH_PERMUTATIONS, LSH_BANDS
+from lyrics_text import clean_lyrics
+
+# Words marking a title as another version of a song. Words that are as often part of a
+# distinct song's title ("Reprise", "Session", "Clean", a "(feat. ...)" credit) are left out
+VERSION_KEYWORDS = (
+    r"remix|live|remaster(?:ed)?|version|edit|acoustic|demo|instrumental|extended|mono|stereo|"
+    r"translation|traducci[oó]n|tradu[cç][aã]o|traduction|[uü]bersetzung|перевод|romanized|deluxe|"
+    r"unplugged|sped up|slowed|karaoke|a cappella"
+)
+# "(Live at Wembley)", "[Remix]", "- 2011 Remaster", "- Radio Edit"
+QUALIFIER_PATTERN = re.compile(
+    rf"\s*[(\[][^)\]]*\b(?:{VERSION_KEYWORDS})\b[^)\]]*[)\]]|\s+[-–—]\s+[^-–—]*\b(?:{VERSION_KEYWORDS})\b.*$",
+    re.IGNORECASE
+)
+TITLE_PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+SHINGLE_SIZE = 3  # Words per shingle
+
+# Universal hashing (a * x + b) mod p over 32-bit shingle hashes; p is a prime above 2 ** 32
+_HASH_PRIME = 4294967311
+
+
+def normalize_title(title):
+    """Return (normalized title, whether a version qualifier was removed)"""
+    title = title or ''
+    stripped = QUALIFIER_PATTERN.sub('', title)
+    normalized = WHITESPACE_PATTERN.sub(' ', TITLE_PUNCTUATION_PATTERN.sub(' ', stripped.lower())).strip()
+    return normalized, stripped != title
+
+
+def song_id(song):
+    """A song's Genius id; lyricsgenius Songs keep it only in their response body"""
+    value = getattr(song, 'id', None)
+    return getattr(song, '_body', {}).get('id') if value is None else value
+
+
+def lyric_shingles(lyrics):
+    """32-bit hashes of the overlapping SHINGLE_SIZE-word sequences in cleaned lyrics"""
+    words = clean_lyrics(lyrics).split()
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))} if words else set()
+    return {zlib.crc32(' '.join(words[i:i + SHINGLE_SIZE]).encode('utf-8'))
+            for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+class MinHasher:
+    """MinHash signatures whose agreement estimates the Jaccard similarity of shingle sets"""
+
+    def __init__(self, permutations=MINHASH_PERMUTATIONS, seed=1):
+        import numpy as np
+
+        rng = np.random.default_rng(seed)
+        # Coefficients below 2 ** 31 keep a * x + b within uint64 for 32-bit x
+        self.a = rng.integers(1, 2 ** 31, size=permutations, dtype=np.uint64)
+        self.b = rng.integers(0, 2 ** 31, size=permutations, dtype=np.uint64)
+
+    def signature(self, shingles):
+        """Signature of a set of shingle hashes, or None if it is empty"""
+        import numpy as np
+
+        if not shingles:
+            return None
+        values = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        hashes = (np.outer(values, self.a) + self.b) % _HASH_PRIME
+        return hashes.min(axis=0)
+
+    @staticmethod
+    def similarity(first, second):
+        """Estimated Jaccard similarity of the sets behind two signatures"""
+        return float((first == second).mean())
+
+
+def find_duplicates(songs, threshold=DEDUPE_SIMILARITY, bands=LSH_BANDS, hasher=None,
+                    title_threshold=DEDUPE_TITLE_SIMILARITY):
+    """Collapse near-duplicate songs, keeping the first original of each group
+
+    songs are lyricsgenius Song-like objects with title, id and (optionally)
+    lyrics. Returns (unique songs in input order, merged) where merged lists
+    a dict per dropped song with the 'kept' and 'merged' titles and ids, the
+    'reason' ('title' or 'lyrics') and the estimated lyrics 'similarity'.
+    Songs whose titles match must also have lyrics similarity of at least
+    title_threshold when both have lyrics.
+    """
+    songs = list(songs)
+    if len(songs) < 2:
+        return songs, []
+    hasher = hasher or MinHasher()
+
+    parent = list(range(len(songs)))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    def union(first, second):
+        first, second = find(first), find(second)
+        if first != second:
+            parent[max(first, second)] = min(first, second)
+
+    signatures = [hasher.signature(lyric_shingles(getattr(song, 'lyrics', ''))) for song in songs]
+    titles = [normalize_title(getattr(song, 'title', '')) for song in songs]
+
+    def similarity(first, second):
+        if signatures[first] is None or signatures[second] is None:
+            return None
+        return hasher.similarity(signatures[first], signatures[second])
+
+    def title_match(first, second):
+        """Same title apart from a version qualifier, with lyrics that don't contradict it"""
+        if titles[first][0] != titles[second][0] or not (titles[first][1] or titles[second][1]):
+            return False
+        lyrics_similarity = similarity(first, second)
+        return lyrics_similarity is None or lyrics_similarity >= title_threshold
+
+    # Same title apart from version qualifiers
+    by_title = {}
+    for index, (title, _) in enumerate(titles):
+        if title:
+            by_title.setdefault(title, []).append(index)
+    for indexes in by_title.values():
+        # A song joins a group only if it matches every member, so a song without
+        # lyrics can't link two versions whose lyrics disagree
+        groups = []
+        for index in indexes:
+            group = next((group for group in groups if all(title_match(other, index) for other in group)), None)
+            if group is None:
+                groups.append([index])
+            else:
+                union(group[0], index)
+                group.append(index)
+
+    # Near-identical lyrics: songs sharing any LSH band bucket are compared
+    rows = max(1, len(hasher.a) // bands)
+    buckets = {}
+    for index, signature in enumerate(signatures):
+        if signature is None:
+            continue
+        for band in range(bands):
+            key = (band, signature[band * rows:(band + 1) * rows].tobytes())
+            for other in buckets.get(key, ()):
+                if find(other) != find(index) and hasher.similarity(signatures[other], signature) >= threshold:
+                    union(other, index)
+            buckets.setdefault(key, []).append(index)
+
+    # Keep an unqualified title from each group when there is one, otherwise its first song
+    groups = {}
+    for index in range(len(songs)):
+        groups.setdefault(find(index), []).append(index)
+    keep = {}
+    for root, indexes in groups.items():
+        keep[root] = next((index for index in indexes if not titles[index][1]), indexes[0])
+
+    unique = []
+    merged = []
+    for index, song in enumerate(songs):
+        kept = keep[find(index)]
+        if kept == index:
+            unique.append(song)
+            continue
+        merged.append({
+            'kept': getattr(songs[kept], 'title', ''),
+            'kept_id': song_id(songs[kept]),
+            'merged': getattr(song, 'title', ''),
+            'merged_id': song_id(song),
+            'reason': 'title' if title_match(kept, index) else 'lyrics',
+            'similarity': similarity(kept, index),
+        })
+    return unique, merged
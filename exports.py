@@ -0,0 +1,108 @@
+# exports.py - Saving and loading analysis tables as CSV, Parquet or Feather
+#
+# The columnar formats store compact dtypes (int32 counts, float32 metrics,
+# categorical strings for repeated values like artist and album), so large
+# annotation tables are several times smaller and reload much faster than CSV.
+# Parquet and Feather need pyarrow.
+
+import io
+import os
+
+# Supported formats and their file extensions
+OUTPUT_FORMATS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'feather': '.feather',
+}
+
+MIME_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'feather': 'application/vnd.apache.arrow.file',
+}
+
+# Always stored as categoricals
+CATEGORY_COLUMNS = ('artist', 'album', 'release_date')
+
+# Other string columns become categoricals when at most this share of values is unique
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+PARQUET_COMPRESSION = 'zstd'
+
+
+def compact_dtypes(df):
+    """Return a copy of df with int32 counts, float32 metrics and categorical repeated strings"""
+    import numpy as np
+    import pandas as pd
+
+    compact = df.copy()
+    for column in compact.columns:
+        values = compact[column]
+        if pd.api.types.is_bool_dtype(values) or isinstance(values.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(values):
+            info = np.iinfo(np.int32)
+            if values.empty or (values.min() >= info.min and values.max() <= info.max):
+                compact[column] = values.astype('Int32' if values.hasnans else np.int32)
+        elif pd.api.types.is_float_dtype(values):
+            compact[column] = values.astype(np.float32)
+        elif column == 'song_id':
+            # Songs without an id are stored as '' by create_song_dataframe
+            compact[column] = pd.to_numeric(values.replace('', None), errors='coerce').astype('Int32')
+        elif pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+            if column in CATEGORY_COLUMNS or \
+                    values.nunique(dropna=False) <= CATEGORY_MAX_UNIQUE_RATIO * len(values):
+                compact[column] = values.astype('category')
+    return compact
+
+
+def output_path(base_path, output_format):
+    """Replace or add the file extension for output_format"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}; expected one of {', '.join(OUTPUT_FORMATS)}")
+    root, extension = os.path.splitext(base_path)
+    if extension.lower() not in OUTPUT_FORMATS.values():
+        root = base_path
+    return root + OUTPUT_FORMATS[output_format]
+
+
+def write_table(df, path, output_format='csv'):
+    """Write df to path (given any extension) in output_format and return the path written"""
+    path = output_path(path, output_format)
+    if output_format == 'csv':
+        df.to_csv(path, index=False)
+    else:
+        _write_columnar(compact_dtypes(df), path, output_format)
+    return path
+
+
+def table_bytes(df, output_format='csv'):
+    """Serialize df in output_format for a download, without touching the disk"""
+    if output_format == 'csv':
+        return df.to_csv(index=False).encode('utf-8')
+    buffer = io.BytesIO()
+    _write_columnar(compact_dtypes(df), buffer, output_format)
+    return buffer.getvalue()
+
+
+def _write_columnar(df, target, output_format):
+    df = df.reset_index(drop=True)
+    if output_format == 'parquet':
+        df.to_parquet(target, index=False, compression=PARQUET_COMPRESSION)
+    else:
+        df.to_feather(target)
+
+
+def load_table(path, columns=None):
+    """Load a table written by write_table, choosing the reader from the file extension
+
+    columns optionally limits which columns are read (cheap for the columnar formats).
+    """
+    import pandas as pd
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == OUTPUT_FORMATS['parquet']:
+        return pd.read_parquet(path, columns=columns)
+    if extension == OUTPUT_FORMATS['feather']:
+        return pd.read_feather(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
@@ -1,35 +1,256 @@
 # genius_analyzer.py - Core functionality for analyzing lyrics from Genius
+#
+# Heavy dependencies (pandas, matplotlib, nltk) are imported on first use so
+# importing this module stays fast for CLI workers and Streamlit cold starts.
+
+from collections import Counter, OrderedDict, deque
+import queue
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config import (MAX_WORKERS, ANALYZER_POOL_SIZE, SENTIMENT_CHUNKSIZE, NLTK_AUTO_DOWNLOAD, OUTPUT_FORMAT,
+                    COMPACT_SONG_RECORDS, DEDUPE_SONGS, DEDUPE_ALBUMS, NLP_PROCESSES, TOKEN_CACHE_SIZE)
+from genius_cache import get_default_cache
+from scoring import compute_ranking_features, rescore_songs, as_scoring_weights
+from exports import write_table
+from charts import complexity_chart
+from alignment import align_annotations
+from lyrics_text import clean_lyrics
+from song_records import SongRecord
+from dedupe import find_duplicates
+from nlp_engine import get_nlp_engine
+from instrumentation import Instrumentation, PhaseStats, span, current as current_instrumentation
+
+# NLTK resources we need, by download name and data path
+NLTK_RESOURCES = {
+    'vader_lexicon': 'sentiment/vader_lexicon.zip',
+    'stopwords': 'corpora/stopwords',
+}
+
+
+class MissingNLTKDataError(LookupError):
+    """Raised when required NLTK data is not installed and auto-download is disabled"""
+
+
+_nltk_ready = False
+_nltk_lock = threading.Lock()
+
+
+def ensure_nltk_data(auto_download=None):
+    """Check once per process that the NLTK data we need is installed
+
+    Missing data is downloaded when auto_download (default
+    config.NLTK_AUTO_DOWNLOAD) is set; otherwise MissingNLTKDataError
+    explains how to install it.
+    """
+    global _nltk_ready
+    if _nltk_ready:
+        return
+    with _nltk_lock:
+        if _nltk_ready:
+            return
+        import nltk
+
+        missing = []
+        for name, path in NLTK_RESOURCES.items():
+            try:
+                nltk.data.find(path)
+            except LookupError:
+                missing.append(name)
+
+        if missing and (NLTK_AUTO_DOWNLOAD if auto_download is None else auto_download):
+            print("Downloading required NLTK data...")
+            missing = [name for name in missing if not nltk.download(name, quiet=True)]
+
+        if missing:
+            names = ", ".join(repr(name) for name in missing)
+            raise MissingNLTKDataError(
+                f"Required NLTK data is not installed: {names}. Install it with: "
+                f"python -c \"import nltk; {'; '.join(f'nltk.download({name!r})' for name in missing)}\""
+            )
+        _nltk_ready = True
+
+
+class TokenizedLyrics:
+    """Lyrics cleaned and tokenized once, shared by every per-song metric"""
+
+    __slots__ = ('source', 'text', 'counts', 'word_count', 'letter_count')
+
+    def __init__(self, lyrics):
+        self.source = lyrics
+
+        text = clean_lyrics(lyrics)
+        self.text = text
+        self.counts = Counter(text.split())
+        self.word_count = sum(self.counts.values())
+        self.letter_count = sum(len(word) * count for word, count in self.counts.items())
+
+    @property
+    def vocabulary(self):
+        """Distinct words in first-appearance order"""
+        return self.counts.keys()
+
+    @property
+    def unique_word_count(self):
+        return len(self.counts)
+
+
+_stop_words = None
+
+
+def get_stop_words():
+    """English stopwords as a set, loaded once"""
+    global _stop_words
+    if _stop_words is None:
+        ensure_nltk_data()
+        from nltk.corpus import stopwords
+        _stop_words = frozenset(stopwords.words('english'))
+    return _stop_words
+
+
+_sentiment_analyzer = None
+_sentiment_analyzer_lock = threading.Lock()
 
-import pandas as pd
-from lyricsgenius import Genius
-import re
-import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.feature_extraction.text import CountVectorizer
-from collections import Counter
-import nltk
-from nltk.sentiment import SentimentIntensityAnalyzer
-import string
-from nltk.corpus import stopwords
-from config import WEIGHTS
-
-# Download required NLTK data on first run
-try:
-    nltk.data.find('vader_lexicon')
-    nltk.data.find('stopwords')
-except LookupError:
-    print("Downloading required NLTK data...")
-    nltk.download('vader_lexicon')
-    nltk.download('stopwords')
+
+def get_sentiment_analyzer():
+    """Shared VADER analyzer, created on first use so the lexicon is parsed once per process"""
+    global _sentiment_analyzer
+    if _sentiment_analyzer is None:
+        with _sentiment_analyzer_lock:
+            if _sentiment_analyzer is None:
+                ensure_nltk_data()
+                from nltk.sentiment import SentimentIntensityAnalyzer
+                _sentiment_analyzer = SentimentIntensityAnalyzer()
+    return _sentiment_analyzer
+
+
+def _score_sentiment_texts(texts):
+    """Score a chunk of cleaned lyrics; runs in-process or in a pool worker"""
+    sia = get_sentiment_analyzer()
+    return [sia.polarity_scores(text) for text in texts]
+
+
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+
+def tokenize_song(song_data):
+    """Return the song's TokenizedLyrics
+
+    The last TOKEN_CACHE_SIZE songs tokenized are kept by song id, so the
+    metrics computed for a song share one tokenization without it being
+    stored on, and kept alive with, the song itself.
+    """
+    lyrics = song_data.get('lyrics') or ''
+    key = song_data.get('song_id')
+    if not key:
+        return TokenizedLyrics(lyrics)
+
+    with _token_cache_lock:
+        tokens = _token_cache.get(key)
+        if tokens is not None and (tokens.source is lyrics or tokens.source == lyrics):
+            _token_cache.move_to_end(key)
+            return tokens
+
+    tokens = TokenizedLyrics(lyrics)
+    with _token_cache_lock:
+        _token_cache[key] = tokens
+        _token_cache.move_to_end(key)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return tokens
+
+
+def song_complexity(song_data):
+    """Complexity metrics of one processed song; the CPU-bound core of analyze_song_complexity"""
+    tokens = tokenize_song(song_data)
+
+    # Calculate metrics
+    word_count = tokens.word_count
+    unique_words = tokens.unique_word_count
+
+    # Calculate lexical diversity (unique words / total words)
+    lexical_diversity = unique_words / word_count if word_count > 0 else 0
+
+    # Calculate average word length
+    avg_word_length = tokens.letter_count / word_count if word_count > 0 else 0
+
+    # Locate the annotated fragments in the lyrics to measure how much of the song they cover
+    alignment = align_annotations(song_data)
+
+    # Sentiment analysis
+    sentiment = get_sentiment_analyzer().polarity_scores(tokens.text)
+
+    complexity_scores = {
+        'word_count': word_count,
+        'unique_words': unique_words,
+        'lexical_diversity': lexical_diversity,
+        'avg_word_length': avg_word_length,
+        'annotation_coverage': alignment.coverage,
+        'annotated_words': alignment.covered_words,
+        'line_coverage': alignment.line_coverage,
+        'unmatched_annotations': len(alignment.unmatched),
+        'sentiment': sentiment
+    }
+
+    return complexity_scores
+
+
+def song_top_words(song_data, n=10):
+    """The n most frequent non-stopwords of one processed song"""
+    tokens = tokenize_song(song_data)
+
+    # Count word frequencies, ignoring stopwords
+    stop_words = get_stop_words()
+    word_counts = Counter({word: count for word, count in tokens.counts.items()
+                           if word not in stop_words and len(word) > 1})
+
+    # Return top N words
+    return word_counts.most_common(n)
+
+
+def song_field(song, name, default=''):
+    """A song attribute, falling back to the Genius response body that newer lyricsgenius Songs keep it in"""
+    value = getattr(song, name, None)
+    if value is None:
+        value = getattr(song, '_body', {}).get(name)
+    return default if value is None else value
 
 
 class GeniusLyricsAnalyzer:
-    def __init__(self, token):
-        """Initialize with your Genius API token"""
-        self.genius = Genius(token)
+    def __init__(self, token, max_workers=MAX_WORKERS, cache=None, nlp_processes=None):
+        """Initialize with your Genius API token
+
+        max_workers bounds how many songs are fetched and analyzed at once
+        during run_analysis; 1 processes songs sequentially.
+        cache is a ResponseCache for API responses; by default the shared
+        on-disk cache is used, and cache=False disables caching.
+        nlp_processes > 1 moves the per-song NLP to a pool of that many
+        worker processes (see nlp_engine.py); the default is NLP_PROCESSES.
+        """
+        from genius_client import CachedGenius, mount_scheduler
+
+        self.cache = get_default_cache() if cache is None else (cache or None)
+        self.genius = CachedGenius(token, cache=self.cache)
         self.genius.verbose = False  # Turn off status messages
         self.genius.remove_section_headers = True  # Remove [Chorus], [Verse], etc.
 
+        # Pacing and retries are handled by the shared request scheduler
+        self.genius.sleep_time = 0
+        mount_scheduler(self.genius._session)
+        self.max_workers = max(1, int(max_workers or 1))
+        self.nlp_engine = self._make_nlp_engine(nlp_processes)
+
+    @staticmethod
+    def _make_nlp_engine(nlp_processes=None):
+        # Engines are shared by every analyzer in the process, so closing an analyzer never stops workers
+        nlp_processes = NLP_PROCESSES if nlp_processes is None else nlp_processes
+        return get_nlp_engine(nlp_processes) if nlp_processes and nlp_processes > 1 else None
+
+    def close(self):
+        """Close the analyzer's HTTP session and its pooled connections"""
+        self.genius._session.close()
+
     def get_song(self, artist_name, song_name):
         """Get a specific song by artist and title"""
         return self.genius.search_song(song_name, artist_name)
@@ -53,22 +274,28 @@ class GeniusLyricsAnalyzer:
         if status_callback:
             status_callback(f"Processing song: {song.title}")
 
+        # Get annotations
+        if status_callback:
+            status_callback(f"Getting annotations for: {song.title}")
+
+        annotations = self.genius.song_annotations(song_field(song, 'id'))
+
+        return self._build_song_data(song, annotations)
+
+    @staticmethod
+    def _build_song_data(song, annotations):
+        """Combine song metadata with its (fragment, explanations) annotation pairs"""
         # Get song metadata
+        album = song_field(song, 'album')
         song_data = {
-            'song_id': getattr(song, 'id', ''),
+            'song_id': song_field(song, 'id'),
             'title': getattr(song, 'title', 'Unknown Title'),
             'artist': getattr(song, 'artist', 'Unknown Artist'),
-            'album': getattr(song, 'album', ''),
-            'release_date': getattr(song, 'release_date', ''),
+            'album': album.get('name', '') if isinstance(album, dict) else getattr(album, 'name', album),
+            'release_date': song_field(song, 'release_date'),
             'lyrics': getattr(song, 'lyrics', '')
         }
 
-        # Get annotations
-        if status_callback:
-            status_callback(f"Getting annotations for: {song.title}")
-
-        annotations = self.genius.song_annotations(song.id)
-
         # Create a mapping of lyric fragments to annotations
         annotation_map = {}
         for lyric, explanations in annotations:
@@ -89,41 +316,7 @@ class GeniusLyricsAnalyzer:
         if status_callback:
             status_callback(f"Analyzing complexity of: {song_data.get('title', 'Unknown')}")
 
-        lyrics = song_data['lyrics']
-
-        # Clean lyrics
-        lyrics_clean = re.sub(r'\[.*?\]', '', lyrics)  # Remove section headers
-        lyrics_clean = re.sub(r'[^\w\s]', '', lyrics_clean)  # Remove punctuation
-        lyrics_clean = lyrics_clean.lower()
-
-        # Calculate metrics
-        word_count = len(lyrics_clean.split())
-        unique_words = len(set(lyrics_clean.split()))
-
-        # Calculate lexical diversity (unique words / total words)
-        lexical_diversity = unique_words / word_count if word_count > 0 else 0
-
-        # Calculate average word length
-        avg_word_length = sum(len(word) for word in lyrics_clean.split()) / word_count if word_count > 0 else 0
-
-        # Calculate annotation richness (percentage of lyrics with annotations)
-        annotation_map = song_data.get('annotation_map', {})
-        annotation_coverage = len(annotation_map) / word_count if word_count > 0 else 0
-
-        # Sentiment analysis
-        sia = SentimentIntensityAnalyzer()
-        sentiment = sia.polarity_scores(lyrics_clean)
-
-        complexity_scores = {
-            'word_count': word_count,
-            'unique_words': unique_words,
-            'lexical_diversity': lexical_diversity,
-            'avg_word_length': avg_word_length,
-            'annotation_coverage': annotation_coverage,
-            'sentiment': sentiment
-        }
-
-        return complexity_scores
+        return song_complexity(song_data)
 
     def get_top_words(self, song_data, n=10, status_callback=None):
         """Get the top N most frequent words in a song"""
@@ -133,24 +326,44 @@ class GeniusLyricsAnalyzer:
         if status_callback:
             status_callback(f"Finding top words in: {song_data.get('title', 'Unknown')}")
 
-        # Clean lyrics
-        lyrics = song_data['lyrics']
-        lyrics_clean = re.sub(r'\[.*?\]', '', lyrics)  # Remove section headers
-        lyrics_clean = re.sub(r'[^\w\s]', '', lyrics_clean)  # Remove punctuation
-        lyrics_clean = lyrics_clean.lower()
+        return song_top_words(song_data, n)
 
-        # Remove stopwords
-        stop_words = set(stopwords.words('english'))
-        words = [word for word in lyrics_clean.split() if word not in stop_words and len(word) > 1]
+    def analyze_songs(self, song_data_list, top_n=10, status_callback=None):
+        """Analyze many processed songs at once, on the NLP process pool if there is one
 
-        # Count word frequencies
-        word_counts = Counter(words)
-
-        # Return top N words
-        return word_counts.most_common(n)
+        Sets each song's 'complexity' like analyze_song_complexity and
+        returns each song's top words, in input order.
+        """
+        songs = [song_data for song_data in song_data_list if song_data and 'lyrics' in song_data]
+        if status_callback:
+            status_callback(f"Analyzing {len(songs)} songs")
+        if self.nlp_engine is not None:
+            results = self.nlp_engine.map(songs, top_n)
+        else:
+            results = [(song_complexity(song_data), song_top_words(song_data, top_n)) for song_data in songs]
+
+        top_words = {}
+        for song_data, (complexity, words) in zip(songs, results):
+            song_data['complexity'] = complexity
+            top_words[id(song_data)] = words
+        return [top_words.get(id(song_data), []) if song_data else [] for song_data in song_data_list]
+
+    def score_sentiment_batch(self, song_data_list, processes=None, chunksize=SENTIMENT_CHUNKSIZE):
+        """Score the sentiment of many songs at once, in input order
+
+        By default songs are scored in-process with the shared analyzer;
+        pass processes > 1 to fan chunks of songs out across the shared NLP
+        pool with that many workers (see nlp_engine.py).
+        """
+        texts = [tokenize_song(song_data).text if song_data else '' for song_data in song_data_list]
+        if not processes or processes <= 1 or len(texts) <= chunksize:
+            return _score_sentiment_texts(texts)
+        return get_nlp_engine(processes).score_sentiment(texts, chunksize)
 
     def create_song_dataframe(self, song_data_list, status_callback=None):
         """Create a DataFrame from processed songs with analysis"""
+        import pandas as pd
+
         if not song_data_list:
             return pd.DataFrame()
 
@@ -173,6 +386,7 @@ class GeniusLyricsAnalyzer:
                 'unique_word_count': 0,
                 'lexical_diversity': 0,
                 'annotation_count': 0,
+                'annotation_coverage': 0,
                 'sentiment_compound': 0
             }
 
@@ -183,6 +397,7 @@ class GeniusLyricsAnalyzer:
                 row['unique_word_count'] = complexity.get('unique_words', 0)
                 row['lexical_diversity'] = complexity.get('lexical_diversity', 0)
                 row['annotation_count'] = len(song_data.get('annotation_map', {}))
+                row['annotation_coverage'] = complexity.get('annotation_coverage', 0)
                 sentiment = complexity.get('sentiment', {})
                 row['sentiment_compound'] = sentiment.get('compound', 0) if sentiment else 0
 
@@ -190,8 +405,86 @@ class GeniusLyricsAnalyzer:
 
         return pd.DataFrame(rows)
 
+    def analyze_complexity_batch(self, song_data_list, include_sentiment=True, sentiment_processes=None,
+                                 status_callback=None):
+        """Compute complexity metrics for many songs at once from a sparse document-term matrix
+
+        Returns the columns of create_song_dataframe plus avg_word_length.
+        Sentiment already computed by analyze_song_complexity is reused;
+        remaining songs are scored with score_sentiment_batch.
+        """
+        import numpy as np
+        import pandas as pd
+        from scipy.sparse import csr_matrix
+
+        songs = [song_data for song_data in song_data_list if song_data]
+        if not songs:
+            return pd.DataFrame()
+
+        if status_callback:
+            status_callback(f"Analyzing complexity of {len(songs)} songs")
+
+        # Build the document-term matrix (one row per song, one column per distinct
+        # word in the batch) straight from the memoized per-song word counts
+        vocabulary = {}
+        indptr = [0]
+        indices = []
+        counts = []
+        for song_data in songs:
+            word_counter = tokenize_song(song_data).counts
+            indices.extend(vocabulary.setdefault(word, len(vocabulary)) for word in word_counter)
+            counts.extend(word_counter.values())
+            indptr.append(len(indices))
+        matrix = csr_matrix((np.array(counts, dtype=np.int64), np.array(indices, dtype=np.int64), indptr),
+                            shape=(len(songs), len(vocabulary)))
+        term_lengths = np.fromiter((len(word) for word in vocabulary), dtype=np.int64, count=len(vocabulary))
+
+        word_counts = np.asarray(matrix.sum(axis=1)).ravel()
+        unique_counts = np.diff(matrix.indptr)  # Non-zero entries per row
+        total_lengths = matrix @ term_lengths
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lexical_diversity = np.where(word_counts > 0, unique_counts / word_counts, 0.0)
+            avg_word_length = np.where(word_counts > 0, total_lengths / word_counts, 0.0)
+
+        # Reuse coverage from analyze_song_complexity; align the rest now
+        annotation_coverage = np.zeros(len(songs))
+        for i, song_data in enumerate(songs):
+            coverage = (song_data.get('complexity') or {}).get('annotation_coverage')
+            annotation_coverage[i] = coverage if coverage is not None else align_annotations(song_data).coverage
+
+        sentiment_compound = np.zeros(len(songs))
+        if include_sentiment:
+            unscored = []
+            for i, song_data in enumerate(songs):
+                sentiment = (song_data.get('complexity') or {}).get('sentiment')
+                if sentiment:
+                    sentiment_compound[i] = sentiment.get('compound', 0)
+                else:
+                    unscored.append(i)
+            if unscored:
+                scores = self.score_sentiment_batch([songs[i] for i in unscored], processes=sentiment_processes)
+                sentiment_compound[unscored] = [score['compound'] for score in scores]
+
+        return pd.DataFrame({
+            'song_id': [song_data.get('song_id', '') for song_data in songs],
+            'title': [song_data.get('title', '') for song_data in songs],
+            'artist': [song_data.get('artist', '') for song_data in songs],
+            'album': [song_data.get('album', '') for song_data in songs],
+            'release_date': [song_data.get('release_date', '') for song_data in songs],
+            'word_count': word_counts.astype(np.int64),
+            'unique_word_count': unique_counts.astype(np.int64),
+            'lexical_diversity': lexical_diversity,
+            'annotation_count': [len(song_data.get('annotation_map', {})) for song_data in songs],
+            'annotation_coverage': annotation_coverage,
+            'sentiment_compound': sentiment_compound,
+            'avg_word_length': avg_word_length
+        })
+
     def create_annotations_dataframe(self, song_data_list, status_callback=None):
         """Create a DataFrame with lyrics and their annotations"""
+        import pandas as pd
+
         if not song_data_list:
             return pd.DataFrame()
 
@@ -215,104 +508,166 @@ class GeniusLyricsAnalyzer:
 
         return pd.DataFrame(rows)
 
-    def rank_songs_by_complexity(self, songs_df, status_callback=None):
-        """Rank songs by complexity metrics and return a composite score"""
+    def rank_songs_by_complexity(self, songs_df, status_callback=None, weights=None):
+        """Rank songs by complexity metrics and return a composite score
+
+        songs_df (raw, or with features from compute_ranking_features) is left
+        unchanged; weights is a ScoringWeights or dict and defaults to config.WEIGHTS.
+        """
+        import pandas as pd
+
         if songs_df.empty:
             return pd.DataFrame()
 
         if status_callback:
             status_callback("Ranking songs by complexity")
 
-        # Create normalized scores (0-1) for each metric
-        songs_df['norm_lexical_diversity'] = (songs_df['lexical_diversity'] - songs_df['lexical_diversity'].min()) / \
-                                             (songs_df['lexical_diversity'].max() - songs_df['lexical_diversity'].min()) \
-            if songs_df['lexical_diversity'].max() != songs_df['lexical_diversity'].min() else 0
-
-        songs_df['norm_annotation_density'] = (songs_df['annotation_count'] / songs_df['word_count']) \
-            if songs_df['word_count'].max() > 0 else 0
+        return rescore_songs(songs_df, weights)
 
-        # Create a composite score using weights from config
-        songs_df['complexity_score'] = (
-                songs_df['norm_lexical_diversity'] * WEIGHTS['lexical_diversity'] +
-                songs_df['norm_annotation_density'] * WEIGHTS['annotation_density']
-        )
+    def visualize_song_complexity(self, ranked_songs, top_n=10, save_path=None, status_callback=None):
+        """Render the complexity charts in memory and return the PNG bytes (None if there is too little data)
 
-        # Rank songs by complexity score
-        ranked_songs = songs_df.sort_values('complexity_score', ascending=False).reset_index(drop=True)
-
-        return ranked_songs
-
-    def visualize_song_complexity(self, ranked_songs, top_n=10, save_path='song_complexity_analysis.png',
-                                  status_callback=None):
-        """Create visualizations of song complexity metrics"""
-        if ranked_songs.empty or len(ranked_songs) < 2:
+        Renders are cached by the plotted data (see charts.py); the image is
+        only written to disk when save_path is given.
+        """
+        if ranked_songs is None or ranked_songs.empty or len(ranked_songs) < 2:
             if status_callback:
                 status_callback("Not enough songs to visualize")
-            return False
+            return None
 
         if status_callback:
             status_callback("Creating visualizations")
 
-        # Limit to top N songs
-        top_songs = ranked_songs.head(min(top_n, len(ranked_songs)))
-
-        # Create figure with subplots
-        fig, axes = plt.subplots(2, 1, figsize=(12, 10))
-
-        # Plot 1: Complexity Score
-        top_songs.plot(x='title', y='complexity_score', kind='bar', ax=axes[0],
-                       title='Song Complexity Scores', color='skyblue')
-        axes[0].set_xlabel('Song')
-        axes[0].set_ylabel('Complexity Score')
-        axes[0].set_xticklabels(top_songs['title'], rotation=45, ha='right')
-
-        # Plot 2: Lexical Diversity vs Annotation Density
-        scatter = axes[1].scatter(top_songs['norm_lexical_diversity'],
-                                  top_songs['norm_annotation_density'],
-                                  s=100, alpha=0.7)
-
-        # Add labels for each point
-        for i, row in top_songs.iterrows():
-            axes[1].annotate(row['title'],
-                             (row['norm_lexical_diversity'], row['norm_annotation_density']),
-                             xytext=(5, 5), textcoords='offset points')
+        image = complexity_chart(ranked_songs, top_n=top_n)
 
-        axes[1].set_xlabel('Lexical Diversity (normalized)')
-        axes[1].set_ylabel('Annotation Density (normalized)')
-        axes[1].set_title('Lexical Diversity vs Annotation Density')
-        axes[1].grid(True, alpha=0.3)
-
-        plt.tight_layout()
-        plt.savefig(save_path)
-        plt.close()
+        if save_path:
+            with open(save_path, 'wb') as f:
+                f.write(image)
+            if status_callback:
+                status_callback(f"Visualization saved as '{save_path}'")
 
-        if status_callback:
-            status_callback(f"Visualization saved as '{save_path}'")
+        return image
 
-        return True
+    def _process_and_analyze(self, song, status_callback=None, announce=True):
+        """Fetch annotations for a song and analyze its complexity"""
+        if announce and status_callback:
+            status_callback(f"Processing song: {song.title}")
 
-    def run_analysis(self, artist_name, album_name=None, song_name=None, max_songs=10, status_callback=None,
-                     save_files=False):
-        """Run a complete analysis on an artist, album, or song"""
-        processed_songs = []
+        with span('process_song', song_id=song_field(song, 'id', None), title=getattr(song, 'title', None)):
+            song_data = self.process_song(song, status_callback)
+            # With an NLP pool the analysis is done by _analyze_in_pool instead
+            if song_data and self.nlp_engine is None:
+                self._analyze_in_process(song_data, status_callback)
+        return song_data
 
+    def _analyze_in_process(self, song_data, status_callback=None):
+        """Set a processed song's 'complexity' and 'top_words' on this thread"""
+        with span('nlp'):
+            song_data['complexity'] = self.analyze_song_complexity(song_data, status_callback)
+            song_data['top_words'] = song_top_words(song_data)
+
+    def _iter_processed_songs(self, songs, status_callback=None, announce=True):
+        """Yield (index, song_data) pairs as songs finish processing, using a bounded worker pool"""
+        songs = list(songs)
+        if self.nlp_engine is not None:
+            yield from self._analyze_in_pool(self._iter_fetched_songs(songs, status_callback, announce), len(songs))
+        else:
+            yield from self._iter_fetched_songs(songs, status_callback, announce)
+
+    def _analyze_in_pool(self, fetched, total):
+        """Analyze (index, song_data) pairs on the NLP pool in chunks, yielding each chunk as it finishes
+
+        Songs keep being fetched while earlier chunks are analyzed.
+        """
+        size = self.nlp_engine.chunk_size(total)
+        pending = deque()
+        chunk = []
+
+        def finished(wait_for_all):
+            while pending and (wait_for_all or pending[0][0].done()):
+                future, items = pending.popleft()
+                for (index, song_data), (complexity, top_words, start, duration) in zip(items, future.result()):
+                    song_data['complexity'] = complexity
+                    song_data['top_words'] = top_words
+                    self._record_nlp_timing(song_data, start, duration)
+                    yield index, song_data
+
+        for index, song_data in fetched:
+            if not song_data:
+                yield index, song_data
+                continue
+            chunk.append((index, song_data))
+            if len(chunk) >= size:
+                pending.append((self.nlp_engine.submit([song for _, song in chunk]), chunk))
+                chunk = []
+            yield from finished(False)
+        if chunk:
+            pending.append((self.nlp_engine.submit([song for _, song in chunk]), chunk))
+        yield from finished(True)
+
+    @staticmethod
+    def _record_nlp_timing(song_data, start, duration):
+        """Report analysis done in a worker process as an 'nlp' span of the song"""
+        instrumentation = current_instrumentation()
+        if instrumentation:
+            instrumentation.emit({'song_id': song_data.get('song_id'), 'title': song_data.get('title'),
+                                  'phase': 'nlp', 'start': start, 'end': start + duration, 'duration': duration})
+
+    def _iter_fetched_songs(self, songs, status_callback=None, announce=True):
+        """Yield (index, song_data) pairs in completion order, fetching songs on a bounded thread pool"""
+        if self.max_workers <= 1 or len(songs) <= 1:
+            for index, song in enumerate(songs):
+                yield index, self._process_and_analyze(song, status_callback, announce)
+            return
+
+        # Workers only queue their status messages; the callback is invoked from
+        # the calling thread so UI callbacks (e.g. Streamlit) keep working
+        messages = queue.Queue()
+        relay = messages.put if status_callback else None
+
+        # Timing events from workers are relayed the same way
+        instrumentation = current_instrumentation()
+        task = instrumentation.bind(self._process_and_analyze) if instrumentation else self._process_and_analyze
+
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(songs)))
+        try:
+            futures = {executor.submit(task, song, relay, announce): index
+                       for index, song in enumerate(songs)}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                if status_callback:
+                    self._drain_messages(messages, status_callback)
+                if instrumentation:
+                    instrumentation.drain()
+                for future in sorted(done, key=futures.get):
+                    yield futures[future], future.result()
+        finally:
+            # Don't start songs nobody will consume if the caller stops early
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _drain_messages(messages, status_callback):
+        """Forward queued worker status messages to the callback"""
+        while True:
+            try:
+                message = messages.get_nowait()
+            except queue.Empty:
+                return
+            status_callback(message)
+
+    def _find_songs(self, artist_name, album_name=None, song_name=None, max_songs=10, status_callback=None):
+        """Look up the songs to analyze; returns (songs, announce) where announce says
+        whether each song's processing should be reported"""
         if album_name:
             if status_callback:
                 status_callback(f"Analyzing album '{album_name}' by {artist_name}...")
 
             album = self.get_album(artist_name, album_name)
             if album and hasattr(album, 'tracks'):
-                for song in album.tracks:
-                    if status_callback:
-                        status_callback(f"Processing song: {song.title}")
-
-                    song_data = self.process_song(song, status_callback)
-                    if song_data:
-                        song_data['complexity'] = self.analyze_song_complexity(song_data, status_callback)
-                        processed_songs.append(song_data)
-            else:
-                if status_callback:
-                    status_callback(f"Album '{album_name}' not found or has no tracks")
+                return list(album.tracks), True
+            if status_callback:
+                status_callback(f"Album '{album_name}' not found or has no tracks")
 
         elif song_name:
             if status_callback:
@@ -320,13 +675,9 @@ class GeniusLyricsAnalyzer:
 
             song = self.get_song(artist_name, song_name)
             if song:
-                song_data = self.process_song(song, status_callback)
-                if song_data:
-                    song_data['complexity'] = self.analyze_song_complexity(song_data, status_callback)
-                    processed_songs.append(song_data)
-            else:
-                if status_callback:
-                    status_callback(f"Song '{song_name}' not found")
+                return [song], False
+            if status_callback:
+                status_callback(f"Song '{song_name}' not found")
 
         else:
             if status_callback:
@@ -334,63 +685,186 @@ class GeniusLyricsAnalyzer:
 
             songs = self.get_artist_songs(artist_name, max_songs=max_songs)
             if songs:
-                for song in songs:
-                    if status_callback:
-                        status_callback(f"Processing song: {song.title}")
-
-                    song_data = self.process_song(song, status_callback)
-                    if song_data:
-                        song_data['complexity'] = self.analyze_song_complexity(song_data, status_callback)
-                        processed_songs.append(song_data)
-            else:
-                if status_callback:
-                    status_callback(f"No songs found for artist: {artist_name}")
+                return list(songs), True
+            if status_callback:
+                status_callback(f"No songs found for artist: {artist_name}")
+
+        return [], False
+
+    def iter_analysis(self, artist_name, album_name=None, song_name=None, max_songs=10, status_callback=None,
+                      save_files=False, ranking_interval=1, weights=None, output_format=OUTPUT_FORMAT,
+                      visualize=True, instrument=None, dedupe=DEDUPE_SONGS):
+        """Run an analysis like run_analysis, yielding progress as each song completes
+
+        Yields event dictionaries with a 'type' key:
+        - 'songs_found': 'total' songs will be processed, after dropping the
+          near-duplicates listed in 'duplicates'
+        - 'song': a processed 'song' record (its input position is 'index'),
+          with 'completed' and 'total' counts; songs arrive in completion order
+        - 'ranking': a 'ranked_songs' snapshot of the songs completed so far,
+          every ranking_interval songs once at least two are done (0 disables)
+        - 'complete': the same 'results' dictionary run_analysis returns
+
+        weights (a ScoringWeights or dict, default config.WEIGHTS) apply to
+        this call only; output_format picks the format of saved tables, and
+        visualize=False skips rendering the complexity chart. Remixes, live
+        versions, translations and other near-duplicates are skipped before
+        their annotations are fetched (see dedupe.py) unless dedupe=False;
+        album track lists are kept whole unless config.DEDUPE_ALBUMS is set.
+        results['duplicates'] lists the songs merged away.
+
+        Timing events (see instrumentation.py) for searches, lyrics scrapes,
+        referents, NLP, ranking and plotting are passed to the instrument
+        hook on the calling thread, and per-phase latency percentiles for the
+        run are returned in results['timings'].
+        """
+        weights = as_scoring_weights(weights)
+        phase_stats = PhaseStats()
+        instrumentation = Instrumentation(phase_stats, instrument)
+        with instrumentation.activate(), span('find_songs'):
+            songs, announce = self._find_songs(artist_name, album_name, song_name, max_songs, status_callback)
+        duplicates = []
+        if dedupe and (not album_name or DEDUPE_ALBUMS):
+            with instrumentation.activate():
+                songs, duplicates = self._dedupe_songs(songs, status_callback)
+        total = len(songs)
+        yield {'type': 'songs_found', 'total': total, 'duplicates': duplicates}
+
+        completed = {}
+        for index, song_data in instrumentation.iterate(self._iter_processed_songs(songs, status_callback,
+                                                                                     announce)):
+            if not song_data:
+                total -= 1  # Song could not be processed
+                continue
 
+            completed[index] = song_data
+            yield {'type': 'song', 'index': index, 'song': song_data, 'completed': len(completed), 'total': total}
+
+            if ranking_interval and len(completed) > 1 and len(completed) % ranking_interval == 0:
+                snapshot = [completed[i] for i in sorted(completed)]
+                with instrumentation.activate(), span('ranking'):
+                    ranked_songs = self.rank_songs_by_complexity(self.create_song_dataframe(snapshot),
+                                                                 weights=weights)
+                yield {'type': 'ranking', 'ranked_songs': ranked_songs, 'completed': len(completed), 'total': total}
+
+        processed_songs = [completed[index] for index in sorted(completed)]
+        with instrumentation.activate():
+            results = self._finalize_analysis(artist_name, processed_songs, status_callback, save_files, weights,
+                                              output_format, visualize)
+        results['duplicates'] = duplicates
+        results['timings'] = phase_stats.summary()
+        yield {'type': 'complete', 'results': results}
+
+    def run_analysis(self, artist_name, album_name=None, song_name=None, max_songs=10, status_callback=None,
+                     save_files=False, weights=None, output_format=OUTPUT_FORMAT, visualize=True,
+                     instrument=None, dedupe=DEDUPE_SONGS):
+        """Run a complete analysis on an artist, album, or song"""
+        for event in self.iter_analysis(artist_name, album_name, song_name, max_songs, status_callback,
+                                        save_files, ranking_interval=0, weights=weights,
+                                        output_format=output_format, visualize=visualize,
+                                        instrument=instrument, dedupe=dedupe):
+            if event['type'] == 'complete':
+                return event['results']
+
+    @staticmethod
+    def _dedupe_songs(songs, status_callback=None):
+        """Drop near-duplicate songs before processing; returns (songs, merged) as dedupe.find_duplicates"""
+        if len(songs) < 2:
+            return songs, []
+        with span('dedupe'):
+            songs, merged = find_duplicates(songs)
+        if merged and status_callback:
+            status_callback(f"Skipping {len(merged)} duplicate song{'s' if len(merged) != 1 else ''}: " +
+                            ", ".join(f"'{entry['merged']}' (same as '{entry['kept']}')" for entry in merged))
+        return songs, merged
+
+    def _finalize_analysis(self, artist_name, processed_songs, status_callback=None, save_files=False,
+                           weights=None, output_format=OUTPUT_FORMAT, visualize=True):
+        """Tabulate, save, rank and visualize processed songs into the run_analysis result"""
+        weights = as_scoring_weights(weights)
         # Create DataFrames
-        songs_df = self.create_song_dataframe(processed_songs, status_callback)
-        annotations_df = self.create_annotations_dataframe(processed_songs, status_callback)
+        with span('tabulate'):
+            songs_df = self.create_song_dataframe(processed_songs, status_callback)
+            annotations_df = self.create_annotations_dataframe(processed_songs, status_callback)
+
+        # Finished songs are kept with the results, so store them compactly
+        if COMPACT_SONG_RECORDS:
+            processed_songs = SongRecord.from_songs(processed_songs)
 
         # Prepare output files dictionary but don't save files by default
         output_files = {}
 
         # Only save files if explicitly requested
         if save_files and not songs_df.empty:
-            songs_file = f"{artist_name.replace(' ', '_')}_songs_analysis.csv"
-            songs_df.to_csv(songs_file, index=False)
+            with span('save'):
+                songs_file = write_table(songs_df, f"{artist_name.replace(' ', '_')}_songs_analysis", output_format)
             output_files['songs_file'] = songs_file
             if status_callback:
                 status_callback(f"Saved song analysis to {songs_file}")
 
             if not annotations_df.empty:
-                annotations_file = f"{artist_name.replace(' ', '_')}_annotations.csv"
-                annotations_df.to_csv(annotations_file, index=False)
+                with span('save'):
+                    annotations_file = write_table(annotations_df, f"{artist_name.replace(' ', '_')}_annotations",
+                                                   output_format)
                 output_files['annotations_file'] = annotations_file
                 if status_callback:
                     status_callback(f"Saved annotations to {annotations_file}")
 
         # Rank songs by complexity
+        # Features are kept with the results so callers can re-rank with other weights
         ranked_songs = None
+        chart_png = None
+        with span('ranking'):
+            ranking_features = compute_ranking_features(songs_df)
+            if len(processed_songs) > 1:
+                ranked_songs = self.rank_songs_by_complexity(ranking_features, status_callback, weights)
         if len(processed_songs) > 1:
-            ranked_songs = self.rank_songs_by_complexity(songs_df, status_callback)
             if status_callback and not ranked_songs.empty:
                 status_callback("\nSongs Ranked by Complexity Score:")
                 for i, row in ranked_songs.iterrows():
                     status_callback(f"{i + 1}. {row['title']} - Complexity Score: {row['complexity_score']:.4f}")
 
-            # Create visualization but only save file if requested
-            visualization_file = f"{artist_name.replace(' ', '_')}_complexity_analysis.png"
-            vis_success = self.visualize_song_complexity(ranked_songs, save_path=visualization_file,
-                                                         status_callback=status_callback)
-            if vis_success and save_files:
-                output_files['visualization_file'] = visualization_file
-            elif vis_success:
-                # Still store the path even if not saved, so the UI knows the file exists temporarily
-                output_files['visualization_file'] = visualization_file
+            # Render the chart in memory; it is only written to disk if files are saved
+            if visualize:
+                visualization_file = f"{artist_name.replace(' ', '_')}_complexity_analysis.png" if save_files else None
+                with span('plotting'):
+                    chart_png = self.visualize_song_complexity(ranked_songs, save_path=visualization_file,
+                                                               status_callback=status_callback)
+                if chart_png and visualization_file:
+                    output_files['visualization_file'] = visualization_file
 
         return {
             'processed_songs': processed_songs,
             'songs_df': songs_df,
             'annotations_df': annotations_df,
             'ranked_songs': ranked_songs,
+            'ranking_features': ranking_features,
+            'weights': weights,
+            'chart_png': chart_png,
             'output_files': output_files
-        }
\ No newline at end of file
+        }
+
+
+_analyzer_pool = OrderedDict()
+_analyzer_pool_lock = threading.Lock()
+
+
+def get_analyzer(token, **options):
+    """Return a long-lived analyzer for this token, shared by every caller in the process
+
+    Analyzers keep their HTTP session (and its warm connections) between
+    calls. The pool holds at most ANALYZER_POOL_SIZE analyzers, closing the
+    least recently used one when full.
+    """
+    key = (hashlib.sha256(token.encode('utf-8')).hexdigest(), tuple(sorted(options.items())))
+    with _analyzer_pool_lock:
+        analyzer = _analyzer_pool.get(key)
+        if analyzer is None:
+            analyzer = GeniusLyricsAnalyzer(token, **options)
+            _analyzer_pool[key] = analyzer
+            while len(_analyzer_pool) > ANALYZER_POOL_SIZE:
+                _, evicted = _analyzer_pool.popitem(last=False)
+                evicted.close()
+        else:
+            _analyzer_pool.move_to_end(key)
+        return analyzer
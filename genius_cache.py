@@ -0,0 +1,161 @@
+# genius_cache.py - Persistent on-disk cache for Genius API responses
+
+import hashlib
+import json
+import threading
+import time
+import zlib
+from config import CACHE_ENABLED, CACHE_PATH, CACHE_MAX_BYTES, CACHE_TTLS, CACHE_DEFAULT_TTL
+from sqlite_store import DefaultStore, connect
+
+# Check the cache size after this many writes rather than on every write
+EVICTION_CHECK_INTERVAL = 64
+
+# Evict down to this fraction of max_bytes so we don't evict on every write
+EVICTION_TARGET_RATIO = 0.9
+
+
+def normalize_params(params):
+    """Normalize request parameters so equivalent requests share a cache key"""
+    if not params:
+        return []
+    items = params.items() if isinstance(params, dict) else params
+    normalized = []
+    for key, value in items:
+        if value is None:
+            continue  # Unset parameters aren't sent, so they don't distinguish requests
+        if isinstance(value, str):
+            value = " ".join(value.split()).lower()
+        normalized.append((str(key), value))
+    return sorted(normalized, key=lambda item: (item[0], str(item[1])))
+
+
+def make_cache_key(endpoint, params=None):
+    """Build a stable cache key from an endpoint and its normalized arguments"""
+    payload = json.dumps([endpoint, normalize_params(params)], default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def endpoint_ttl(path, web=False):
+    """Look up the configured time-to-live (seconds) for an endpoint"""
+    if web:
+        return CACHE_TTLS.get('lyrics', CACHE_DEFAULT_TTL)
+    resource = path.strip('/').split('/', 1)[0]
+    return CACHE_TTLS.get(resource, CACHE_DEFAULT_TTL)
+
+
+class ResponseCache:
+    """SQLite-backed response cache with per-entry TTLs, size-bounded LRU eviction and hit/miss counters"""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        # Access to the shared connection is serialized by _lock
+        self._conn = connect(path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    def get(self, endpoint, params=None):
+        """Return the cached response for a request, or None if missing or expired"""
+        key = make_cache_key(endpoint, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def set(self, endpoint, params, value, ttl=CACHE_DEFAULT_TTL):
+        """Store a JSON-serializable response for ttl seconds"""
+        blob = zlib.compress(json.dumps(value).encode('utf-8'))
+        key = make_cache_key(endpoint, params)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, value, size, created_at, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, endpoint, blob, len(blob), now, now + ttl, now)
+            )
+            self._writes += 1
+            if self._writes % EVICTION_CHECK_INTERVAL == 0:
+                self._evict(now)
+
+    def _evict(self, now):
+        """Drop expired entries, then least recently used ones until under the size limit"""
+        self._conn.execute("DELETE FROM responses WHERE expires_at < ?", (now,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = self.max_bytes * EVICTION_TARGET_RATIO
+        stale_keys = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if total <= target:
+                break
+            stale_keys.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the cache"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0,
+                'entries': entries,
+                'size_bytes': size
+            }
+
+    def clear(self):
+        """Remove every cached response and reset the counters"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self.hits = 0
+            self.misses = 0
+
+    def close(self):
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+def is_success(status_code):
+    """Whether an HTTP status is a 2xx success, the only responses worth caching"""
+    return status_code is not None and 200 <= status_code < 300
+
+
+_default_cache = DefaultStore(ResponseCache, "Response cache unavailable, requests will not be cached")
+
+
+def get_default_cache():
+    """Return the process-wide response cache, or None if caching is disabled or unavailable"""
+    if not CACHE_ENABLED:
+        return None
+    return _default_cache.get()
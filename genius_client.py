@@ -0,0 +1,101 @@
+# genius_client.py - requests/lyricsgenius transport for the synchronous analyzer
+#
+# CachedGenius serves Genius requests from the response cache, and
+# SchedulingAdapter routes every HTTP request through the shared request
+# scheduler. They subclass lyricsgenius and requests classes, so they live
+# apart from genius_cache.py and request_scheduler.py; those stay cheap to
+# import for code that only needs the cache or the rate limiter.
+
+import threading
+import time
+from lyricsgenius import Genius
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
+from genius_cache import endpoint_ttl, is_success
+from request_scheduler import get_scheduler, parse_retry_after
+from instrumentation import span, request_phase, record_bytes
+
+
+class CachedGenius(Genius):
+    """Genius client that serves GET requests from a ResponseCache when possible
+
+    Only successful responses are stored: lyricsgenius returns the HTML of
+    any web page, including 404 and 5xx error pages, as if it were lyrics.
+    """
+
+    def __init__(self, *args, cache=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+        # Status of the last response on each thread, recorded by a session hook
+        self._status = threading.local()
+        self._session.hooks['response'].append(self._record_status)
+
+    def _record_status(self, response, *args, **kwargs):
+        self._status.code = response.status_code
+
+    def _make_request(self, path, method='GET', params_=None, public_api=False, web=False, **kwargs):
+        if self.cache is None or method != 'GET' or kwargs:
+            with span(request_phase(path, web), path=path):
+                return super()._make_request(path, method=method, params_=params_,
+                                             public_api=public_api, web=web, **kwargs)
+
+        # Endpoints are namespaced by API so identical paths on different hosts don't collide
+        endpoint = f"{'web' if web else 'public' if public_api else 'api'}:{path}"
+        with span(request_phase(path, web), path=path) as fields:
+            response = self.cache.get(endpoint, params_)
+            if response is not None:
+                fields['cache'] = 'hit'
+                return response
+
+            fields['cache'] = 'miss'
+            self._status.code = None
+            response = super()._make_request(path, method=method, params_=params_,
+                                             public_api=public_api, web=web)
+            status_code = fields['status'] = self._status.code
+        if is_success(status_code):
+            self.cache.set(endpoint, params_, response, ttl=endpoint_ttl(path, web))
+        return response
+
+
+class SchedulingAdapter(HTTPAdapter):
+    """requests transport adapter that routes every request through a RequestScheduler"""
+
+    def __init__(self, scheduler, **kwargs):
+        kwargs.setdefault('pool_maxsize', scheduler.max_concurrency)
+        super().__init__(**kwargs)
+        self.scheduler = scheduler
+
+    def send(self, request, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                with self.scheduler.slot():
+                    response = super().send(request, **kwargs)
+                    if not kwargs.get('stream'):
+                        # Read the body while the connection slot is held
+                        record_bytes(len(response.content))
+            except (ConnectionError, Timeout):
+                if attempt >= self.scheduler.max_retries:
+                    raise
+                delay = self.scheduler.backoff_delay(attempt)
+            else:
+                if not self.scheduler.should_retry(response.status_code, attempt):
+                    return response
+                delay = self.scheduler.backoff_delay(attempt, parse_retry_after(response.headers.get('Retry-After')))
+                if response.status_code == 429:
+                    # Throttling applies to the whole process: hold back every caller,
+                    # and let the rate limiter delay this retry too
+                    self.scheduler.bucket.pause(delay)
+                    delay = 0
+                response.close()
+            attempt += 1
+            if delay > 0:
+                time.sleep(delay)
+
+
+def mount_scheduler(session, scheduler=None):
+    """Route all HTTP(S) requests made by a requests.Session through the scheduler"""
+    adapter = SchedulingAdapter(scheduler or get_scheduler())
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return adapter
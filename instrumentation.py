@@ -0,0 +1,208 @@
+# instrumentation.py - Structured timing events for analysis runs
+#
+# Work is wrapped in span(phase, ...) blocks. When an Instrumentation is active
+# in the current thread or asyncio task, each span emits an event dictionary when it ends:
+#   phase     e.g. 'search', 'lyrics', 'referents', 'nlp', 'plotting'
+#   start/end wall-clock timestamps (time.time()); duration in seconds
+#   song_id, title     when the work belongs to one song
+#   bytes     bytes received over the network
+#   cache     'hit' or 'miss' for requests that went through the response cache
+#   error     exception type name if the work failed
+# Spans nest (request phases happen inside 'find_songs' and 'process_song') and
+# inherit song_id/title from the enclosing span. With no active Instrumentation
+# spans cost next to nothing.
+
+import math
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Request phases by API resource; scraped pages are 'lyrics' and anything else is 'search'
+REQUEST_PHASES = {
+    'referents': 'referents',
+    'songs': 'metadata',
+}
+
+# Latency percentiles reported by PhaseStats
+PERCENTILES = (50, 90, 95, 99)
+
+# Per thread and per asyncio task: the active Instrumentation and the open spans
+_active = ContextVar('instrumentation', default=None)
+_spans = ContextVar('instrumentation_spans', default=())
+
+
+def request_phase(path, web=False):
+    """Name the phase of a Genius request from its path"""
+    if web:
+        return 'lyrics'
+    return REQUEST_PHASES.get(path.strip('/').split('/', 1)[0], 'search')
+
+
+def current():
+    """Return the Instrumentation active in this thread or task, or None"""
+    return _active.get()
+
+
+@contextmanager
+def span(phase, **fields):
+    """Time a block of work, emitting an event to the active Instrumentation when it ends
+
+    Yields the event's fields so the block can add to them (e.g. fields['cache'] = 'hit').
+    """
+    instrumentation = _active.get()
+    if instrumentation is None:
+        yield fields
+        return
+
+    stack = _spans.get()
+    if stack:
+        for key in ('song_id', 'title'):
+            if key not in fields and key in stack[-1]:
+                fields[key] = stack[-1][key]
+    token = _spans.set(stack + (fields,))
+    start, started = time.time(), time.perf_counter()
+    try:
+        yield fields
+    except BaseException as e:
+        fields['error'] = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        _spans.reset(token)
+        instrumentation.emit(dict(fields, phase=phase, start=start, end=start + duration, duration=duration))
+
+
+def record_bytes(count):
+    """Add received bytes to the innermost open span"""
+    stack = _spans.get()
+    if stack:
+        stack[-1]['bytes'] = stack[-1].get('bytes', 0) + count
+
+
+class Instrumentation:
+    """Delivers span events to hooks on the thread that created it
+
+    Hooks are plain callables taking an event dictionary. Events from worker
+    threads are queued and delivered by drain() (or the next event on the
+    owning thread), so hooks may safely touch UI state like status callbacks do.
+    """
+
+    def __init__(self, *hooks):
+        self.hooks = [hook for hook in hooks if hook]
+        self._owner = threading.get_ident()
+        self._queue = queue.SimpleQueue()
+
+    def emit(self, event):
+        if threading.get_ident() != self._owner:
+            self._queue.put(event)
+            return
+        self.drain()
+        self._deliver(event)
+
+    def drain(self):
+        """Deliver events queued by worker threads"""
+        while True:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            self._deliver(event)
+
+    def _deliver(self, event):
+        for hook in self.hooks:
+            hook(event)
+
+    @contextmanager
+    def activate(self):
+        """Make this the active Instrumentation in the current thread or task for the block"""
+        token = _active.set(self)
+        try:
+            yield self
+        finally:
+            _active.reset(token)
+
+    def bind(self, function):
+        """Wrap a function so it runs with this Instrumentation active, e.g. in a worker thread"""
+        def bound(*args, **kwargs):
+            with self.activate():
+                return function(*args, **kwargs)
+        return bound
+
+    def iterate(self, iterable):
+        """Iterate with this Instrumentation active only while producing each item"""
+        iterator = iter(iterable)
+        try:
+            while True:
+                with self.activate():
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                    self.drain()
+                yield item
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close:
+                with self.activate():
+                    close()
+
+
+def _percentile(sorted_values, q):
+    """Linearly interpolated percentile of an already sorted list"""
+    position = q / 100 * (len(sorted_values) - 1)
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+class PhaseStats:
+    """Hook that aggregates span events into per-phase latency percentiles for a run"""
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self):
+        """Return {phase: stats} with counts, total seconds, latency percentiles (ms), bytes and cache hits"""
+        with self._lock:
+            events = list(self.events)
+
+        phases = {}
+        for event in events:
+            phases.setdefault(event['phase'], []).append(event)
+
+        summary = {}
+        for phase, phase_events in phases.items():
+            durations = sorted(event['duration'] for event in phase_events)
+            stats = {
+                'count': len(durations),
+                'total_s': sum(durations),
+                'mean_ms': 1000 * sum(durations) / len(durations),
+            }
+            for q in PERCENTILES:
+                stats[f'p{q}_ms'] = 1000 * _percentile(durations, q)
+            stats['max_ms'] = 1000 * durations[-1]
+            stats['bytes'] = sum(event.get('bytes', 0) for event in phase_events)
+            stats['cache_hits'] = sum(event.get('cache') == 'hit' for event in phase_events)
+            stats['cache_misses'] = sum(event.get('cache') == 'miss' for event in phase_events)
+            stats['errors'] = sum('error' in event for event in phase_events)
+            summary[phase] = stats
+        return summary
+
+    def format_summary(self):
+        """Render the summary as a plain-text table, slowest phases first"""
+        summary = self.summary()
+        lines = [f"{'phase':<14}{'count':>7}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"
+                 f"{'bytes':>12}{'cache hit':>11}"]
+        for phase, stats in sorted(summary.items(), key=lambda item: -item[1]['total_s']):
+            lookups = stats['cache_hits'] + stats['cache_misses']
+            hit_rate = f"{stats['cache_hits'] / lookups:.0%}" if lookups else '-'
+            lines.append(f"{phase:<14}{stats['count']:>7}{stats['total_s']:>10.2f}{stats['p50_ms']:>10.1f}"
+                         f"{stats['p95_ms']:>10.1f}{stats['max_ms']:>10.1f}{stats['bytes']:>12}{hit_rate:>11}")
+        return "\n".join(lines)
@@ -0,0 +1,20 @@
+# lyrics_text.py - Cleaning rules shared by everything that turns lyrics into words
+#
+# Tokenization, annotation alignment and duplicate detection all need to agree
+# on what a word is, so the patterns live here rather than in any one of them.
+
+import re
+
+# Precompiled patterns for cleaning lyrics before tokenization
+SECTION_HEADER_PATTERN = re.compile(r'\[.*?\]')
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+
+
+def clean_lyrics(text, header_replacement=''):
+    """Remove section headers and punctuation, then lowercase
+
+    header_replacement is put in place of each "[Chorus]"-style header; use ' '
+    for short fragments where a header could otherwise join two words.
+    """
+    text = SECTION_HEADER_PATTERN.sub(header_replacement, text or '')
+    return PUNCTUATION_PATTERN.sub('', text).lower()
@@ -0,0 +1,123 @@
+# nlp_engine.py - Process pool for the CPU-bound per-song analysis
+#
+# Cleaning, tokenizing, alignment, VADER scoring and top-word counting are pure
+# Python, so threads can't spread them over cores. NLPEngine sends songs to a
+# pool of worker processes in chunks. Each worker loads NLTK data, the VADER
+# lexicon and the stopword set once, when it starts. Results come back in input
+# order, with each song's timing, so the parent can report 'nlp' spans as if
+# the work had run in-process.
+
+import math
+import os
+import threading
+import time
+from config import NLP_PROCESSES, NLP_CHUNKSIZE
+
+
+def _init_worker():
+    """Load the NLP resources once per worker process"""
+    from genius_analyzer import ensure_nltk_data, get_sentiment_analyzer, get_stop_words
+
+    ensure_nltk_data()
+    get_sentiment_analyzer()
+    get_stop_words()
+
+
+def _analyze_chunk(songs, top_n):
+    """Analyze (lyrics, annotation_map) pairs in a worker; returns (complexity, top_words, start, duration) each"""
+    from genius_analyzer import song_complexity, song_top_words
+
+    results = []
+    for lyrics, annotation_map in songs:
+        song_data = {'lyrics': lyrics, 'annotation_map': annotation_map}
+        start, started = time.time(), time.perf_counter()
+        complexity = song_complexity(song_data)
+        top_words = song_top_words(song_data, top_n)
+        results.append((complexity, top_words, start, time.perf_counter() - started))
+    return results
+
+
+def _score_chunk(texts):
+    """VADER scores of cleaned lyrics texts in a worker"""
+    from genius_analyzer import _score_sentiment_texts
+
+    return _score_sentiment_texts(texts)
+
+
+class NLPEngine:
+    """Runs song_complexity and song_top_words for batches of songs on a process pool
+
+    The pool is started on first use and kept until close(), so workers and
+    their loaded lexicons are reused across analyses.
+    """
+
+    def __init__(self, processes=NLP_PROCESSES, chunksize=NLP_CHUNKSIZE):
+        self.processes = processes or os.cpu_count() or 1
+        self.chunksize = max(1, chunksize)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                from genius_analyzer import ensure_nltk_data
+
+                # Fail here with install instructions rather than with a broken pool
+                ensure_nltk_data()
+                # Spawned workers are safe to start from a threaded parent (e.g. Streamlit)
+                self._executor = ProcessPoolExecutor(max_workers=self.processes,
+                                                     mp_context=multiprocessing.get_context('spawn'),
+                                                     initializer=_init_worker)
+            return self._executor
+
+    def chunk_size(self, total):
+        """Songs per chunk for a batch of `total`: small enough to keep every worker busy"""
+        return max(1, min(self.chunksize, math.ceil(total / self.processes)))
+
+    def submit(self, song_data_list, top_n=10):
+        """Start analyzing songs; the future's result is a list of (complexity, top_words, start, duration)"""
+        songs = [(song_data.get('lyrics') or '', song_data.get('annotation_map', {})) for song_data in song_data_list]
+        return self._get_executor().submit(_analyze_chunk, songs, top_n)
+
+    def map(self, song_data_list, top_n=10):
+        """Analyze songs in chunks across the pool, returning (complexity, top_words) pairs in input order"""
+        song_data_list = list(song_data_list)
+        size = self.chunk_size(len(song_data_list))
+        futures = [self.submit(song_data_list[i:i + size], top_n) for i in range(0, len(song_data_list), size)]
+        return [(complexity, top_words) for future in futures for complexity, top_words, _, _ in future.result()]
+
+    def score_sentiment(self, texts, chunksize=None):
+        """VADER scores of cleaned lyrics texts, scored in chunks across the pool, in input order"""
+        texts = list(texts)
+        size = chunksize or self.chunk_size(len(texts))
+        executor = self._get_executor()
+        futures = [executor.submit(_score_chunk, texts[i:i + size]) for i in range(0, len(texts), size)]
+        return [scores for future in futures for scores in future.result()]
+
+    def close(self):
+        """Shut down the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_nlp_engine(processes=NLP_PROCESSES):
+    """Return the process-wide engine with this many workers, shared by every analyzer"""
+    with _engines_lock:
+        engine = _engines.get(processes)
+        if engine is None:
+            engine = _engines[processes] = NLPEngine(processes)
+        return engine
@@ -0,0 +1,97 @@
+# request_scheduler.py - Process-wide pacing, concurrency limits and retries for Genius requests
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from config import (REQUEST_RATE, REQUEST_BURST, MAX_CONCURRENT_REQUESTS, MAX_REQUEST_RETRIES,
+                    RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX)
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self):
+        """Take a token and return how many seconds the caller must wait before using it"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        """Block until a token is available"""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        """Hold back every caller for at least `seconds`, e.g. after the provider throttles us"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class RequestScheduler:
+    """Rate limiter, connection cap and retry policy shared by every Genius client in the process"""
+
+    def __init__(self, rate=REQUEST_RATE, burst=REQUEST_BURST, max_concurrency=MAX_CONCURRENT_REQUESTS,
+                 max_retries=MAX_REQUEST_RETRIES, backoff_base=RETRY_BACKOFF_BASE, backoff_max=RETRY_BACKOFF_MAX):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the concurrent connection slots once the rate limiter allows it"""
+        with self._slots:
+            self.bucket.acquire()
+            yield
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """Jittered exponential backoff for a retry, honoring a server-provided Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def should_retry(self, status_code, attempt):
+        """Whether a response status is transient and retries remain"""
+        return status_code in RETRY_STATUSES and attempt < self.max_retries
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header given in seconds (HTTP-date values are ignored)"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide request scheduler"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
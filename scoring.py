@@ -0,0 +1,189 @@
+# scoring.py - Complexity scoring and ranking of analyzed songs
+#
+# Ranking is split in two: features are normalized once per result set, and
+# scoring them with a set of weights is a cheap, pure operation that can be
+# repeated (e.g. whenever the weight sliders move) without refetching anything.
+# Weights are passed to every call as an immutable ScoringWeights, so feature
+# tables can be shared between callers scoring with different weights.
+
+from collections import namedtuple
+from config import WEIGHTS
+
+# Normalized feature columns and the weight that applies to each
+FEATURE_WEIGHTS = {
+    'norm_lexical_diversity': 'lexical_diversity',
+    'norm_annotation_density': 'annotation_density',
+}
+
+
+class ScoringWeights(namedtuple('ScoringWeights', list(FEATURE_WEIGHTS.values()))):
+    """Immutable, hashable weights for the composite complexity score, one field per ranking feature"""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_mapping(cls, weights):
+        """Build weights from a dict like config.WEIGHTS; missing entries weigh 0"""
+        return cls(**{name: float(weights.get(name, 0)) for name in cls._fields})
+
+    def normalized(self):
+        """Return these weights scaled to sum to 1
+
+        All-zero weights would score every song 0 and leave the songs in table
+        order, so they fall back to the config defaults (DEFAULT_WEIGHTS).
+        """
+        total = sum(self)
+        if total > 0:
+            return self._make(weight / total for weight in self)
+        return DEFAULT_WEIGHTS.normalized() if sum(DEFAULT_WEIGHTS) > 0 else self
+
+    def __getitem__(self, key):
+        # Allow weights['lexical_diversity'] like the config dict
+        if isinstance(key, str):
+            return getattr(self, key)
+        return super().__getitem__(key)
+
+
+DEFAULT_WEIGHTS = ScoringWeights.from_mapping(WEIGHTS)
+
+
+def as_scoring_weights(weights=None):
+    """Coerce None (the config defaults), a dict or a ScoringWeights into ScoringWeights"""
+    if weights is None:
+        return DEFAULT_WEIGHTS
+    if isinstance(weights, ScoringWeights):
+        return weights
+    return ScoringWeights.from_mapping(weights)
+
+
+def compute_ranking_features(songs_df):
+    """Return a copy of songs_df with the normalized features used for ranking"""
+    features = songs_df.copy()
+    if features.empty:
+        return features
+
+    # Create normalized scores (0-1) for each metric
+    lexical_diversity = features['lexical_diversity']
+    spread = lexical_diversity.max() - lexical_diversity.min()
+    features['norm_lexical_diversity'] = (lexical_diversity - lexical_diversity.min()) / spread if spread != 0 else 0
+
+    features['norm_annotation_density'] = (features['annotation_count'] / features['word_count']) \
+        if features['word_count'].max() > 0 else 0
+
+    return features
+
+
+def rescore_songs(features_df, weights=None):
+    """Score precomputed ranking features with the given weights and return a new ranked DataFrame
+
+    features_df comes from compute_ranking_features (raw song tables are
+    normalized on the fly) and is never modified. weights may be a
+    ScoringWeights, a dict, or None for the config defaults.
+    """
+    import numpy as np
+
+    weights = as_scoring_weights(weights)
+    if features_df.empty:
+        return features_df.copy()
+    if any(column not in features_df.columns for column in FEATURE_WEIGHTS):
+        features_df = compute_ranking_features(features_df)
+
+    # Weighted sum of the feature columns, then a stable descending sort
+    scores = np.zeros(len(features_df))
+    for column, weight_name in FEATURE_WEIGHTS.items():
+        scores += features_df[column].to_numpy(dtype=float) * getattr(weights, weight_name)
+    order = np.argsort(-scores, kind='stable')
+
+    ranked_songs = features_df.iloc[order].reset_index(drop=True)
+    ranked_songs['complexity_score'] = scores[order]
+    return ranked_songs
+
+
+def feature_matrix(features_df):
+    """Normalized ranking features as an (n_songs, n_features) float array, in FEATURE_WEIGHTS order"""
+    import numpy as np
+
+    if any(column not in features_df.columns for column in FEATURE_WEIGHTS):
+        features_df = compute_ranking_features(features_df)
+    matrix = features_df[list(FEATURE_WEIGHTS)].to_numpy(dtype=float)
+
+    # Songs with no words have infinite annotation density; keep them on top
+    # without letting inf * 0 weights turn into NaN
+    return np.nan_to_num(matrix, nan=0.0, posinf=1e12, neginf=-1e12)
+
+
+def random_weight_matrix(count, seed=None):
+    """Draw `count` weight vectors uniformly from the simplex (each row sums to 1)"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    return rng.dirichlet(np.ones(len(FEATURE_WEIGHTS)), size=count)
+
+
+def ranking_sensitivity(features_df, weight_matrix, top_k=5, return_ranks=False):
+    """Rank songs under many weightings at once and summarize how stable each song's rank is
+
+    weight_matrix has one row per weighting and one column per entry of
+    FEATURE_WEIGHTS (in order). All weightings are scored with a single
+    matrix multiply. Returns a DataFrame with one row per song (in
+    features_df order) describing its rank distribution:
+    rank_mean/std/min/p5/median/p95/max, rank_stability (share of
+    weightings in which the song holds its most common rank) and
+    top_k_frequency. With return_ranks=True the full (n_songs, n_weightings)
+    rank matrix is returned as well.
+    """
+    import numpy as np
+    import pandas as pd
+
+    features = feature_matrix(features_df)
+    weights = np.atleast_2d(np.asarray(weight_matrix, dtype=float))
+    n_songs, n_weightings = len(features), len(weights)
+
+    # scores[j, i] is song i's score under weighting j; rows are sorted independently
+    scores = weights @ features.T
+    order = np.argsort(-scores, axis=1)
+
+    # Rank 1 is the highest score. The unstable sort is several times faster;
+    # weightings that produce exact ties are re-sorted stably so tied songs
+    # keep the table order like rescore_songs
+    sorted_scores = np.take_along_axis(scores, order, axis=1)
+    tied = (sorted_scores[:, 1:] == sorted_scores[:, :-1]).any(axis=1)
+    if tied.any():
+        order[tied] = np.argsort(-scores[tied], axis=1, kind='stable')
+
+    ranks = np.empty((n_weightings, n_songs), dtype=np.int32)
+    np.put_along_axis(ranks, order, np.arange(1, n_songs + 1, dtype=np.int32)[None, :], axis=1)
+    ranks = np.ascontiguousarray(ranks.T)
+
+    # Length of the longest run of equal ranks in each song's sorted ranks
+    sorted_ranks = np.sort(ranks, axis=1)
+    run_starts = np.ones((n_songs, n_weightings), dtype=bool)
+    run_starts[:, 1:] = sorted_ranks[:, 1:] != sorted_ranks[:, :-1]
+    start_positions = np.flatnonzero(run_starts)
+    run_lengths = np.diff(np.append(start_positions, n_songs * n_weightings))
+    modal_counts = np.zeros(n_songs, dtype=np.int64)
+    np.maximum.at(modal_counts, start_positions // n_weightings, run_lengths)
+
+    def percentile(q):
+        # Linear interpolation on the already sorted ranks, as np.percentile does
+        position = q / 100 * (n_weightings - 1)
+        lower = int(position)
+        upper = min(lower + 1, n_weightings - 1)
+        fraction = position - lower
+        return sorted_ranks[:, lower] * (1 - fraction) + sorted_ranks[:, upper] * fraction
+
+    summary = pd.DataFrame({
+        'rank_mean': ranks.mean(axis=1),
+        'rank_std': ranks.std(axis=1),
+        'rank_min': sorted_ranks[:, 0],
+        'rank_p5': percentile(5),
+        'rank_median': percentile(50),
+        'rank_p95': percentile(95),
+        'rank_max': sorted_ranks[:, -1],
+        'rank_stability': modal_counts / n_weightings,
+        'top_k_frequency': (ranks <= top_k).mean(axis=1)
+    }, index=features_df.index)
+    if 'title' in features_df.columns:
+        summary.insert(0, 'title', features_df['title'].to_numpy())
+
+    return (summary, ranks) if return_ranks else summary
@@ -0,0 +1,189 @@
+# song_records.py - Compact storage for processed songs kept in memory
+#
+# A processed song is built as a plain dict (see GeniusLyricsAnalyzer._build_song_data).
+# Results that are kept around, such as in every Streamlit session, hold
+# SongRecords instead:
+#   - fields live in __slots__ rather than a per-song dict
+#   - artist, album and release date strings are interned, so they are shared between songs
+#   - lyrics and annotations can be zlib-compressed
+#   - complexity metrics are packed into a float array
+# A SongRecord behaves like the dict it replaces: get, [], 'key' in record,
+# keys(), items(). Nested values (annotation_map, complexity) are rebuilt on
+# every access, so change them by assigning a whole new value.
+
+import json
+import sys
+import zlib
+from array import array
+from collections.abc import MutableMapping
+from config import COMPRESS_SONG_TEXT
+
+# Numeric complexity metrics in the order they are packed, followed by the sentiment scores
+COMPLEXITY_FIELDS = ('word_count', 'unique_words', 'lexical_diversity', 'avg_word_length', 'annotation_coverage',
+                     'annotated_words', 'unmatched_annotations')
+COMPLEXITY_INT_FIELDS = frozenset({'word_count', 'unique_words', 'annotated_words', 'unmatched_annotations'})
+SENTIMENT_FIELDS = ('neg', 'neu', 'pos', 'compound')
+
+FIELDS = ('song_id', 'title', 'artist', 'album', 'release_date', 'lyrics', 'annotation_map', 'complexity')
+
+
+# Placeholder for fields a song doesn't have; NaN never compares equal to itself
+_MISSING = float('nan')
+
+
+def _is_packable(value):
+    """Whether a metric can be stored in the float array and read back unchanged"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _pack_text(text, compress):
+    if not compress or not text:
+        return text
+    return zlib.compress(text.encode('utf-8'))
+
+
+def _unpack_text(value):
+    return zlib.decompress(value).decode('utf-8') if isinstance(value, bytes) else value
+
+
+class SongRecord(MutableMapping):
+    """Memory-compact, dict-compatible processed song"""
+
+    __slots__ = ('song_id', 'title', 'artist', 'album', 'release_date', '_lyrics', '_annotations',
+                 '_metrics', '_line_coverage', '_complexity_extra', '_extra', '_compress')
+
+    def __init__(self, song_data=None, compress=COMPRESS_SONG_TEXT):
+        self._compress = compress
+        self.song_id = ''
+        self.title = ''
+        self.artist = ''
+        self.album = ''
+        self.release_date = ''
+        self._lyrics = ''
+        self._annotations = None
+        self._metrics = None
+        self._line_coverage = None
+        self._complexity_extra = None
+        self._extra = None
+        for key, value in (song_data or {}).items():
+            self[key] = value
+
+    @classmethod
+    def from_songs(cls, song_data_list, compress=COMPRESS_SONG_TEXT):
+        """Convert processed song dicts to records, passing through empty entries and existing records"""
+        return [song_data if not song_data or isinstance(song_data, cls) else cls(song_data, compress)
+                for song_data in song_data_list]
+
+    # annotation_map is stored as a list of [fragment, annotation] pairs, as (compressed) JSON
+
+    def _get_annotation_map(self):
+        if self._annotations is None:
+            return {}
+        return dict(json.loads(_unpack_text(self._annotations)))
+
+    def _set_annotation_map(self, annotation_map):
+        if not annotation_map:
+            self._annotations = None
+        else:
+            self._annotations = _pack_text(json.dumps(list(annotation_map.items()), ensure_ascii=False),
+                                           self._compress)
+
+    def _get_complexity(self):
+        if self._metrics is None:
+            return dict(self._complexity_extra or {})
+        # Fields the song didn't have are packed as NaN and left out again here
+        values = iter(self._metrics)
+        complexity = {field: int(value) if field in COMPLEXITY_INT_FIELDS else value
+                      for field, value in zip(COMPLEXITY_FIELDS, values) if value == value}
+        if self._line_coverage is not None:
+            lines, fractions = self._line_coverage
+            complexity['line_coverage'] = dict(zip(lines, fractions))
+        sentiment = {field: value for field, value in zip(SENTIMENT_FIELDS, values) if value == value}
+        if sentiment:
+            complexity['sentiment'] = sentiment
+        complexity.update(self._complexity_extra or {})
+        return complexity
+
+    def _set_complexity(self, complexity):
+        complexity = dict(complexity or {})
+        if not complexity:
+            self._metrics = self._line_coverage = self._complexity_extra = None
+            return
+        sentiment = complexity.get('sentiment')
+        if isinstance(sentiment, dict) and sentiment and set(sentiment) <= set(SENTIMENT_FIELDS) \
+                and all(_is_packable(value) for value in sentiment.values()):
+            del complexity['sentiment']
+        else:
+            sentiment = {}
+        line_coverage = complexity.pop('line_coverage', None)
+        metrics = [float(complexity.pop(field)) if _is_packable(complexity.get(field)) else _MISSING
+                   for field in COMPLEXITY_FIELDS]
+        metrics += [float(sentiment[field]) if field in sentiment else _MISSING for field in SENTIMENT_FIELDS]
+        self._metrics = array('d', metrics)
+        self._line_coverage = None
+        if line_coverage is not None:
+            self._line_coverage = (array('I', line_coverage.keys()), array('d', line_coverage.values()))
+        # Anything that can't be packed, including fields set to None, is kept as given
+        self._complexity_extra = complexity or None
+
+    def __getitem__(self, key):
+        if key in ('song_id', 'title', 'artist', 'album', 'release_date'):
+            return getattr(self, key)
+        if key == 'lyrics':
+            return _unpack_text(self._lyrics)
+        if key == 'annotation_map':
+            return self._get_annotation_map()
+        if key == 'complexity' and (self._metrics is not None or self._complexity_extra):
+            return self._get_complexity()
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in ('song_id', 'title'):
+            setattr(self, key, value)
+        elif key in ('artist', 'album', 'release_date'):
+            setattr(self, key, _intern(value))
+        elif key == 'lyrics':
+            self._lyrics = _pack_text(value or '', self._compress)
+        elif key == 'annotation_map':
+            self._set_annotation_map(value)
+        elif key == 'complexity':
+            self._set_complexity(value)
+        elif self._extra is None:
+            self._extra = {key: value}
+        else:
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key == 'complexity' and (self._metrics is not None or self._complexity_extra):
+            self._set_complexity(None)
+        elif self._extra and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        yield from FIELDS[:-1]
+        if self._metrics is not None or self._complexity_extra:
+            yield 'complexity'
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, key):
+        # Without this, Mapping would fetch (and decompress) the value just to test for the key
+        if key in FIELDS[:-1]:
+            return True
+        if key == 'complexity':
+            return self._metrics is not None or bool(self._complexity_extra)
+        return bool(self._extra) and key in self._extra
+
+    def __repr__(self):
+        return f"SongRecord(song_id={self.song_id!r}, title={self.title!r}, artist={self.artist!r})"
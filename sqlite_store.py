@@ -0,0 +1,42 @@
+# sqlite_store.py - Connection setup and process-wide defaults shared by the SQLite-backed stores
+
+import os
+import sqlite3
+import threading
+import warnings
+
+
+def connect(path):
+    """Open a store's database, creating its directory if needed
+
+    The connection is in autocommit mode and shared by all threads; callers
+    serialize access with their own lock and group writes with explicit BEGIN/COMMIT.
+    """
+    directory = os.path.dirname(path)
+    if directory and path != ':memory:':
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class DefaultStore:
+    """Lazily created process-wide store instance that degrades to None if the database can't be opened"""
+
+    def __init__(self, factory, unavailable_message):
+        self._factory = factory
+        self._unavailable_message = unavailable_message
+        self._store = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._store is None:
+                try:
+                    self._store = self._factory()
+                except (sqlite3.Error, OSError) as e:
+                    warnings.warn(f"{self._unavailable_message}: {e}")
+                    return None
+            return self._store
@@ -0,0 +1,245 @@
+# Async backend against a local stub of the Genius API
+#
+# Run from the repository root: python -m pytest tests (or python -m unittest discover tests)
+#
+# The stub serves canned Genius responses on a local port to both the
+# lyricsgenius-based GeniusLyricsAnalyzer and the aiohttp-based
+# AsyncGeniusLyricsAnalyzer, so the two backends can be compared request for request.
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+from async_genius_analyzer import AsyncGeniusLyricsAnalyzer
+from genius_analyzer import song_field
+from genius_cache import ResponseCache
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures")
+
+ARTIST = {"id": 10, "name": "Stub Artist"}
+
+
+def song_info(song_id, title, **fields):
+    return {"id": song_id, "title": title, "primary_artist": ARTIST, "lyrics_state": "complete",
+            "instrumental": False, "url": f"https://genius.com/Stub-artist-song-{song_id}-lyrics", **fields}
+
+
+def lyrics_page(lines):
+    body = "<br/>".join(lines)
+    return f'<html><body><div data-lyrics-container="true">{body}</div></body></html>'
+
+
+def multi_search(*songs):
+    return {"sections": [{"type": "top_hit", "hits": []},
+                         {"type": "song", "hits": [{"index": "song", "type": "song", "result": song}
+                                                   for song in songs]}]}
+
+
+class StubGenius:
+    """Canned Genius responses, keyed by the root ('api', 'public' or 'web') and path"""
+
+    def __init__(self):
+        with open(os.path.join(FIXTURES, "referents.json"), encoding="utf-8") as f:
+            referents = json.load(f)["response"]["referents"]
+
+        first = song_info(1, "First Song")
+        missing = song_info(2, "Missing Page")
+        hidden = song_info(3, "Fallback Song")
+        feature = song_info(4, "Guest Verse", primary_artist={"id": 11, "name": "Other Artist"})
+        tracklist = song_info(5, "Stub Album (Tracklist)")
+        self.routes = {
+            ("public", "search/multi"): {"stub artist": {"sections": [
+                                             {"type": "artist", "hits": [{"index": "artist", "type": "artist",
+                                                                          "result": ARTIST}]}]},
+                                         "first song stub artist": multi_search(first),
+                                         "missing page stub artist": multi_search(missing),
+                                         "fallback song stub artist": multi_search()},
+            ("public", "search"): {"fallback song stub artist": {"hits": [{"type": "song", "result": hidden}]}},
+            ("api", "songs/1"): {"song": {**first, "album": {"name": "Stub Album"}, "release_date": "2020-01-01"}},
+            ("api", "songs/2"): {"song": missing},
+            ("api", "songs/3"): {"song": hidden},
+            ("api", "songs/4"): {"song": feature},
+            ("api", "artists/10"): {"artist": {**ARTIST, "api_path": "/artists/10", "header_image_url": "",
+                                               "image_url": "", "is_meme_verified": False, "is_verified": False,
+                                               "url": "https://genius.com/artists/Stub-artist"}},
+            ("api", "artists/10/songs"): {"songs": [tracklist, feature, first, hidden], "next_page": None},
+            # More referents than the Genius default page size, as one response
+            ("api", "referents"): {"referents": referents * 30},
+            ("web", "Stub-artist-song-1-lyrics"): lyrics_page([referent["fragment"] for referent in referents]),
+            ("web", "Stub-artist-song-3-lyrics"): lyrics_page(["Found through the fallback search"]),
+        }
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def respond(self, root, path, params):
+        with self._lock:
+            self.requests.append((root, path, tuple(sorted(params.items()))))
+        response = self.routes.get((root, path))
+        if isinstance(response, dict) and "q" in params:
+            response = response.get(" ".join(params["q"].split()).lower())
+        if response is None:
+            return 404, "text/html", "<html>Oops! Page not found</html>"
+        if root == "web":
+            return 200, "text/html", response
+        return 200, "application/json", json.dumps({"meta": {"status": 200}, "response": response})
+
+
+def start_server(stub):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            root, _, path = url.path.lstrip("/").partition("/")
+            status, content_type, body = stub.respond(root, path, dict(parse_qsl(url.query)))
+            body = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class AsyncBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stub = StubGenius()
+        self.server = start_server(self.stub)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.roots = {"api_root": f"{base}/api/", "public_api_root": f"{base}/public/", "web_root": f"{base}/web/"}
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def make_analyzer(self, cache=False):
+        """An async analyzer whose sync client and async client both point at the stub"""
+        analyzer = AsyncGeniusLyricsAnalyzer("stub-token", cache=cache, timeout=5, **self.roots)
+        analyzer.genius.API_ROOT = self.roots["api_root"]
+        analyzer.genius.PUBLIC_API_ROOT = self.roots["public_api_root"]
+        analyzer.genius.WEB_ROOT = self.roots["web_root"]
+        return analyzer
+
+    def run_async(self, analyzer, method, *args):
+        async def run():
+            async with analyzer:
+                return await getattr(analyzer.client, method)(*args)
+        return asyncio.run(run())
+
+    def take_requests(self):
+        requests, self.stub.requests = self.stub.requests, []
+        return requests
+
+    def test_search_song_matches_sync_requests_and_result(self):
+        analyzer = self.make_analyzer()
+        expected = analyzer.get_song("Stub Artist", "First Song")
+        sync_requests = self.take_requests()
+
+        song = self.run_async(analyzer, "search_song", "First Song", "Stub Artist")
+        self.assertEqual(sorted(self.take_requests()), sorted(sync_requests))
+        self.assertEqual(song.id, song_field(expected, "id"))
+        for attribute in ("title", "artist", "lyrics"):
+            self.assertEqual(getattr(song, attribute), getattr(expected, attribute))
+
+    def test_search_song_falls_back_to_song_search(self):
+        analyzer = self.make_analyzer()
+        song = self.run_async(analyzer, "search_song", "Fallback Song", "Stub Artist")
+        self.assertEqual(song.id, 3)
+        self.assertEqual(song.lyrics, "Found through the fallback search")
+        self.assertEqual(song_field(analyzer.get_song("Stub Artist", "Fallback Song"), "id"), 3)
+
+    def test_artist_songs_match_sync_client(self):
+        analyzer = self.make_analyzer()
+        expected = analyzer.get_artist_songs("Stub Artist", max_songs=5)
+        songs = self.run_async(analyzer, "search_artist_songs", "Stub Artist", 5)
+        self.assertEqual([song.id for song in songs], [song_field(song, "id") for song in expected])
+        self.assertEqual([song.id for song in songs], [1, 3])
+
+    def test_annotations_match_sync_client(self):
+        analyzer = self.make_analyzer()
+        expected = analyzer.genius.song_annotations(1)
+        sync_requests = self.take_requests()
+
+        annotations = self.run_async(analyzer, "song_annotations", 1)
+        self.assertEqual(self.take_requests(), sync_requests)
+        self.assertEqual(annotations, expected)
+        self.assertGreater(len(annotations), 50)
+
+    def test_backends_share_cache_entries(self):
+        cache = ResponseCache(os.path.join(self.tmp.name, "responses.sqlite3"))
+        self.addCleanup(cache.close)
+        analyzer = self.make_analyzer(cache)
+        analyzer.get_song("Stub Artist", "First Song")
+        analyzer.genius.song_annotations(1)
+        self.take_requests()
+
+        self.run_async(analyzer, "search_song", "First Song", "Stub Artist")
+        self.run_async(analyzer, "song_annotations", 1)
+        self.assertEqual(self.take_requests(), [])
+
+    def test_error_pages_are_not_lyrics_or_cached(self):
+        cache = ResponseCache(os.path.join(self.tmp.name, "responses.sqlite3"))
+        self.addCleanup(cache.close)
+        analyzer = self.make_analyzer(cache)
+
+        lyrics = self.run_async(analyzer, "lyrics", "https://genius.com/Stub-artist-song-2-lyrics")
+        self.assertEqual(lyrics, "")
+        self.run_async(analyzer, "lyrics", "https://genius.com/Stub-artist-song-2-lyrics")
+        self.assertEqual(len(self.take_requests()), 2)
+        self.assertIsNone(self.run_async(analyzer, "search_song", "Missing Page", "Stub Artist"))
+        self.take_requests()
+
+        analyzer.genius.lyrics(song_url="https://genius.com/Stub-artist-song-2-lyrics")
+        analyzer.genius.lyrics(song_url="https://genius.com/Stub-artist-song-2-lyrics")
+        self.assertEqual(len(self.take_requests()), 2)
+        self.assertEqual(cache.stats()["entries"], 2)  # Only the successful song search and metadata
+
+    def test_sync_close_closes_both_sessions(self):
+        for keep_loop in (True, False):
+            analyzer = self.make_analyzer()
+            loop = asyncio.new_event_loop()
+            # Requests outside 'async with' open the session on demand
+            loop.run_until_complete(analyzer.client.search_song("First Song", "Stub Artist"))
+            if not keep_loop:
+                loop.close()
+            session = analyzer.client._session
+            with mock.patch.object(analyzer.genius._session, "close") as sync_close:
+                self.assertIsNone(analyzer.close())
+            self.assertTrue(session.closed)
+            sync_close.assert_called_once_with()
+            if keep_loop:
+                loop.close()
+
+    def test_inherited_sync_analysis(self):
+        from genius_analyzer import MissingNLTKDataError, ensure_nltk_data
+
+        try:
+            ensure_nltk_data()
+        except MissingNLTKDataError:
+            self.skipTest("NLTK data is not installed")
+
+        analyzer = self.make_analyzer()
+        expected = analyzer.run_analysis("Stub Artist", song_name="First Song", visualize=False)
+
+        async def run():
+            async with analyzer:
+                return await analyzer.run_analysis_async("Stub Artist", song_name="First Song", visualize=False)
+        results = asyncio.run(run())
+        self.assertEqual([dict(song) for song in results['processed_songs']],
+                         [dict(song) for song in expected['processed_songs']])
+        self.assertEqual(results['processed_songs'][0]['album'], "Stub Album")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+# Near-duplicate detection on lyricsgenius Songs
+#
+# Run from the repository root: python -m pytest tests (or python -m unittest discover tests)
+
+import unittest
+
+from lyricsgenius.types import Song
+
+from dedupe import find_duplicates
+
+LYRICS = "we walk along the river light and every night i hear you calling out my name again\n" * 3
+
+
+def make_song(song_id, title, lyrics=LYRICS):
+    return Song(lyrics, {"id": song_id, "title": title, "primary_artist": {"id": 10, "name": "Stub Artist"}})
+
+
+class FindDuplicatesTest(unittest.TestCase):
+
+    def test_merged_entries_carry_song_ids(self):
+        songs = [make_song(1, "Home"), make_song(2, "Home (Live)"), make_song(3, "Away", LYRICS.upper())]
+        self.assertFalse(hasattr(songs[0], "id"))
+
+        unique, merged = find_duplicates(songs)
+        self.assertEqual(unique, songs[:1])
+        self.assertEqual([(entry['kept_id'], entry['merged_id'], entry['reason']) for entry in merged],
+                         [(1, 2, 'title'), (1, 3, 'lyrics')])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+# Analysis on the NLP process pool against the in-process path
+#
+# Run from the repository root: python -m pytest tests (or python -m unittest discover tests)
+
+import unittest
+
+from genius_analyzer import GeniusLyricsAnalyzer, MissingNLTKDataError, ensure_nltk_data
+
+WORDS = ("river light night calling name morning city money fire rain summer winter ocean heart road "
+         "window shadow dream silver golden thunder whisper garden mountain echo").split()
+
+
+def make_songs(count=4):
+    """Processed songs whose lyrics have more distinct words than the default top 10"""
+    return [{'song_id': song_id, 'title': f"Song {song_id}", 'annotation_map': {},
+             'lyrics': "\n".join(" ".join(WORDS[(song_id + line) % len(WORDS):][:4]) * (line + 1)
+                                 for line in range(len(WORDS)))}
+            for song_id in range(count)]
+
+
+class NLPEngineTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            ensure_nltk_data()
+        except MissingNLTKDataError:
+            raise unittest.SkipTest("NLTK data is not installed")
+
+    def test_pool_and_in_process_top_words_agree(self):
+        in_process = GeniusLyricsAnalyzer("stub-token", cache=False, nlp_processes=0)
+        pooled = GeniusLyricsAnalyzer("stub-token", cache=False, nlp_processes=2)
+        self.addCleanup(pooled.nlp_engine.close)
+
+        for top_n in (5, 20):
+            expected = in_process.analyze_songs(make_songs(), top_n=top_n)
+            self.assertEqual([len(words) for words in expected], [top_n] * 4)
+            self.assertEqual(pooled.analyze_songs(make_songs(), top_n=top_n), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
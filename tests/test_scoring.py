@@ -0,0 +1,36 @@
+# Composite complexity scoring with per-call weights
+#
+# Run from the repository root: python -m pytest tests (or python -m unittest discover tests)
+
+import unittest
+
+import pandas as pd
+
+from scoring import DEFAULT_WEIGHTS, ScoringWeights, rescore_songs
+
+SONGS = pd.DataFrame({
+    'title': ["Plain", "Annotated", "Wordy"],
+    'word_count': [100, 100, 100],
+    'annotation_count': [0, 10, 1],
+    'lexical_diversity': [0.2, 0.3, 0.9],
+})
+
+
+class ScoringWeightsTest(unittest.TestCase):
+
+    def test_normalized_sums_to_one(self):
+        weights = ScoringWeights(0.3, 0.1).normalized()
+        self.assertAlmostEqual(weights.lexical_diversity, 0.75)
+        self.assertAlmostEqual(weights.annotation_density, 0.25)
+
+    def test_all_zero_weights_fall_back_to_defaults(self):
+        weights = ScoringWeights(0.0, 0.0).normalized()
+        self.assertEqual(weights, DEFAULT_WEIGHTS.normalized())
+
+        ranked = rescore_songs(SONGS, weights)
+        self.assertTrue((ranked['complexity_score'] > 0).any())
+        self.assertEqual(list(ranked['title']), list(rescore_songs(SONGS, DEFAULT_WEIGHTS.normalized())['title']))
+
+
+if __name__ == "__main__":
+    unittest.main()
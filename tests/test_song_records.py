@@ -0,0 +1,32 @@
+# SongRecord must read back exactly the song dict it was built from
+#
+# Run from the repository root: python -m pytest tests (or python -m unittest discover tests)
+
+import unittest
+
+from song_records import SongRecord
+
+SONG = {
+    'song_id': 1, 'title': "Home", 'artist': "Stub Artist", 'album': "Stub Album", 'release_date': "2020-01-01",
+    'lyrics': "[Verse]\nfirst line\nsecond line\nthird line",
+    'annotation_map': {"first line": "An annotation"},
+    'complexity': {'word_count': 6, 'unique_words': 4, 'lexical_diversity': 2 / 3, 'avg_word_length': 4.5,
+                   'annotation_coverage': 1 / 3, 'annotated_words': 2, 'unmatched_annotations': 0,
+                   'line_coverage': {1: 1.0, 2: 1 / 3, 3: 0.0},
+                   'sentiment': {'neg': 0.0, 'neu': 0.7, 'pos': 0.3, 'compound': 0.4404}},
+}
+
+
+class SongRecordTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        for compress in (False, True):
+            self.assertEqual(dict(SongRecord(SONG, compress=compress)), SONG)
+
+    def test_missing_metrics_are_not_invented(self):
+        song = {**SONG, 'complexity': {'word_count': 6, 'sentiment': {'compound': 0.4404}, 'note': None}}
+        self.assertEqual(SongRecord(song)['complexity'], song['complexity'])
+
+
+if __name__ == "__main__":
+    unittest.main()
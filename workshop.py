@@ -0,0 +1,260 @@
+# workshop.py - Text helpers for the Songwriter's Workshop
+
+import re
+import string
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+
+# Common theme words looked for in annotations
+THEME_WORDS = [
+    "love", "heartbreak", "struggle", "hope", "freedom",
+    "identity", "change", "time", "memory", "loss",
+    "power", "conflict", "journey", "transformation", "nature",
+    "society", "politics", "religion", "faith", "doubt",
+    "joy", "pain", "longing", "desire", "fear"
+]
+
+WORD_PATTERN = re.compile(r"[a-z]+")
+
+
+def count_themes(texts, themes=THEME_WORDS):
+    """Count whole-word mentions of each theme across texts in a single pass
+
+    Each text is tokenized once and the tokens tallied, so "time" matches
+    "time" and "time's" but not "sometimes". Returns {theme: count} for themes
+    mentioned at least once, most mentioned first.
+    """
+    counts = Counter()
+    for text in texts:
+        if isinstance(text, str):
+            counts.update(WORD_PATTERN.findall(text.lower()))
+    theme_counts = {theme: counts[theme.lower()] for theme in themes if counts[theme.lower()]}
+    return dict(sorted(theme_counts.items(), key=lambda item: item[1], reverse=True))
+
+
+# Rhymes are matched on an approximate pronunciation of each word's ending, built
+# from spelling rules. Uppercase letters mark long vowels (A as in "day", E "see",
+# I "my", O "go", U "blue"). It is rough, but needs no pronunciation dictionary.
+
+# Common words whose endings the rules below get wrong
+IRREGULAR_SPELLINGS = {
+    'love': 'luv', 'above': 'abuv', 'dove': 'duv', 'glove': 'gluv', 'shove': 'shuv', 'of': 'uv',
+    'come': 'kum', 'some': 'sum', 'done': 'dun', 'none': 'nun', 'one': 'wun', 'gone': 'gon',
+    'have': 'hav', 'give': 'giv', 'live': 'liv', 'were': 'wur', 'are': 'ar', 'the': 'thu', 'a': 'u',
+    'to': 'tU', 'do': 'dU', 'who': 'hU', 'you': 'yU', 'through': 'thrU', 'two': 'tU', 'too': 'tU',
+    'though': 'thO', 'tough': 'tuf', 'rough': 'ruf', 'enough': 'enuf', 'said': 'sed', 'again': 'agen',
+    'heart': 'hart', 'eye': 'I', 'eyes': 'Is', 'bye': 'bI', 'i': 'I', 'my': 'mI', 'by': 'bI',
+    'they': 'thA', 'hey': 'hA', 'grey': 'grA', 'obey': 'obA', 'there': 'thAr', 'where': 'wAr',
+    'their': 'thAr', 'bear': 'bAr', 'wear': 'wAr', 'swear': 'swAr', 'pear': 'pAr',
+    'now': 'nau', 'how': 'hau', 'wow': 'wau', 'cow': 'kau', 'allow': 'alau', 'vow': 'vau',
+    'somehow': 'sumhau', 'own': 'On', 'known': 'nOn', 'shown': 'shOn', 'grown': 'grOn',
+    'blown': 'blOn', 'flown': 'flOn', 'thrown': 'thrOn', 'unknown': 'unOn', 'your': 'yor',
+    'four': 'for', 'pour': 'por', 'yours': 'yors', 'what': 'wut', 'was': 'wus', 'word': 'wurd',
+    'world': 'wurld', 'work': 'wurk', 'want': 'wont', 'maybe': 'mAbE', 'move': 'mUv', 'prove': 'prUv',
+    'lose': 'lUs', 'whose': 'hUs',
+}
+
+# (pattern, replacement) pairs applied in order to turn a spelling into a pronunciation
+SPELLING_RULES = [(re.compile(pattern), replacement) for pattern, replacement in [
+    (r"(?:tion|sion|cian)(s?)$", r"shun\1"),
+    (r"eigh", "A"),
+    (r"(?:ough|augh)t", "ot"),
+    (r"igh", "I"),
+    (r"ough$", "O"),
+    (r"ck", "k"),
+    (r"ph", "f"),
+    (r"qu", "kw"),
+    (r"dge", "j"),
+    (r"c(?=[eiy])", "s"),
+    (r"c", "k"),
+    (r"(?<=[^aeiou])le$", "ul"),
+    (r"ear(?=n|l|ch|th)", "er"),
+    (r"ear", "Ir"),
+    (r"ower", "auer"),
+    (r"own$", "aun"),
+    (r"ow", "O"),
+    (r"[ao]u", "au"),
+    (r"aw", "au"),
+    (r"a[iy]", "A"),
+    (r"ee|ea|ei", "E"),
+    (r"ie(?!s?$)", "E"),
+    (r"oa|oe(?=s?$)", "O"),
+    (r"oo|ew|ue(?=s?$)|ui", "U"),
+    (r"oy", "oi"),
+    (r"ey$", "E"),
+    (r"^([^aeiouAEIOU]*)e$", r"\1E"),
+    (r"(?<=[^aeiouAEIOU])o$", "O"),
+]]
+
+# Single vowel, consonant(s), silent e: "fame", "time", "those", "tune"
+MAGIC_E_PATTERN = re.compile(r"(?<![aeiouAEIOU])([aeiou])([b-df-hj-np-tv-z]|th|sh|ch)e([sd]?)$")
+# Silent e after a long vowel: "leave", "believe", "breathe"
+SILENT_E_PATTERN = re.compile(r"([AEIOU](?:[b-df-hj-np-tv-z]|th|sh|ch))e([sd]?)$")
+DOUBLE_CONSONANT_PATTERN = re.compile(r"([b-df-hj-np-tv-z])\1")
+FINAL_Y_PATTERN = re.compile(r"(?<=[^aeiouAEIOU])(?:y|ie)(s?)$")
+VOWEL_GROUP_PATTERN = re.compile(r"[aeiouAEIOU]+")
+LETTERS_PATTERN = re.compile(r"[^a-z]")
+
+# Rhyme strengths, strongest first
+DOUBLE_RHYME = 4   # Last two syllables sound alike: "never" / "forever"
+PERFECT_RHYME = 3  # Last syllable sounds alike: "night" / "fight"
+SLANT_RHYME = 2    # Same final vowel sound: "night" / "time"
+EYE_RHYME = 1      # Only the spelling of the ending matches: "love" / "move"
+
+RHYME_STRENGTH_LABELS = {
+    DOUBLE_RHYME: 'double rhyme', PERFECT_RHYME: 'perfect rhyme', SLANT_RHYME: 'slant rhyme', EYE_RHYME: 'eye rhyme',
+}
+
+SCHEME_LETTERS = string.ascii_uppercase + string.ascii_lowercase
+
+
+def _long_vowel(match):
+    return match.group(1).upper() + match.group(2) + match.group(3)
+
+
+def _final_y(match, word):
+    # "my", "cry", "die" end in I; "baby", "money", "movie" end in E
+    head = word[:match.start()]
+    return ('E' if VOWEL_GROUP_PATTERN.search(head) else 'I') + match.group(1)
+
+
+def pronounce(word):
+    """Approximate the pronunciation of a word from its spelling (see SPELLING_RULES)"""
+    word = LETTERS_PATTERN.sub('', word.lower())
+    if word in IRREGULAR_SPELLINGS:
+        return IRREGULAR_SPELLINGS[word]
+    word = FINAL_Y_PATTERN.sub(lambda match: _final_y(match, word), word)
+    for pattern, replacement in SPELLING_RULES:
+        word = pattern.sub(replacement, word)
+    word = MAGIC_E_PATTERN.sub(_long_vowel, word)
+    word = SILENT_E_PATTERN.sub(r"\1\2", word)
+    word = DOUBLE_CONSONANT_PATTERN.sub(r"\1", word)
+    return word.replace('z', 's')
+
+
+@lru_cache(maxsize=65536)
+def rhyme_keys(word):
+    """Return (last syllable, last two syllables, final vowel) of a word's pronunciation
+
+    Two words rhyme perfectly when their last syllables match. The two-syllable
+    key is None for one-syllable words.
+    """
+    sounds = pronounce(word)
+    groups = list(VOWEL_GROUP_PATTERN.finditer(sounds))
+    if not groups:
+        return sounds, None, ''
+    last = sounds[groups[-1].start():]
+    double = sounds[groups[-2].start():] if len(groups) > 1 else None
+    return last, double, groups[-1].group()
+
+
+def rhyme_strength(first, second):
+    """How strongly two words rhyme: DOUBLE_RHYME, PERFECT_RHYME, SLANT_RHYME, EYE_RHYME or 0"""
+    first_keys, second_keys = rhyme_keys(first), rhyme_keys(second)
+    if first_keys[1] is not None and first_keys[1] == second_keys[1]:
+        return DOUBLE_RHYME
+    if first_keys[0] == second_keys[0]:
+        return PERFECT_RHYME
+    if first_keys[2] and first_keys[2] == second_keys[2]:
+        return SLANT_RHYME
+    if len(first) > 2 and len(second) > 2 and first[-2:] == second[-2:]:
+        return EYE_RHYME
+    return 0
+
+
+class RhymeIndex:
+    """Words of a result set indexed by rhyme sound and by reversed spelling
+
+    Built once per analysis; rhymes() answers from hash lookups and a binary
+    search instead of scanning the vocabulary. word_counts is a
+    {word: count} mapping, used to suggest common words first.
+    """
+
+    def __init__(self, word_counts):
+        counts = {}
+        for word, count in word_counts.items():
+            word = LETTERS_PATTERN.sub('', word.lower())
+            if len(word) > 1:
+                counts[word] = counts.get(word, 0) + count
+        # Most frequent first, so every bucket below is already in suggestion order
+        self.words = sorted(counts, key=lambda word: (-counts[word], word))
+        self.counts = counts
+
+        self._by_double = {}
+        self._by_last = {}
+        self._by_vowel = {}
+        for word in self.words:
+            last, double, vowel = rhyme_keys(word)
+            self._by_last.setdefault(last, []).append(word)
+            if double is not None:
+                self._by_double.setdefault(double, []).append(word)
+            if vowel:
+                self._by_vowel.setdefault(vowel, []).append(word)
+
+        # Reversed spellings in sorted order: words sharing an ending form a contiguous run
+        self._reversed = sorted(word[::-1] for word in self.words)
+
+    @classmethod
+    def from_songs(cls, song_data_list):
+        """Build an index over the lyrics of processed songs"""
+        from genius_analyzer import tokenize_song
+
+        counts = Counter()
+        for song_data in song_data_list:
+            if song_data and song_data.get('lyrics'):
+                counts.update(tokenize_song(song_data).counts)
+        return cls(counts)
+
+    def __len__(self):
+        return len(self.words)
+
+    def with_ending(self, ending):
+        """Indexed words whose spelling ends with `ending`"""
+        reversed_ending = ending[::-1]
+        start = bisect_left(self._reversed, reversed_ending)
+        end = bisect_left(self._reversed, reversed_ending + '\U0010ffff', start)
+        return [word[::-1] for word in self._reversed[start:end]]
+
+    def rhymes(self, word, limit=10):
+        """Return up to `limit` (word, strength) pairs, strongest rhymes first, then most common"""
+        word = LETTERS_PATTERN.sub('', word.lower())
+        if not word:
+            return []
+        last, double, vowel = rhyme_keys(word)
+
+        results = []
+        seen = {word}
+
+        def collect(candidates, strength):
+            for candidate in candidates:
+                if len(results) >= limit:
+                    return
+                if candidate not in seen:
+                    seen.add(candidate)
+                    results.append((candidate, strength))
+
+        if double is not None:
+            collect(self._by_double.get(double, ()), DOUBLE_RHYME)
+        collect(self._by_last.get(last, ()), PERFECT_RHYME)
+        collect(self._by_vowel.get(vowel, ()), SLANT_RHYME)
+        for length in range(min(len(word) - 1, 4), 1, -1):
+            if len(results) >= limit:
+                break
+            collect(sorted(self.with_ending(word[-length:]), key=lambda w: -self.counts[w]), EYE_RHYME)
+        return results
+
+
+def rhyme_scheme(words):
+    """Label rhyming words with the same letter, e.g. ['night', 'day', 'light', 'way'] -> 'ABAB'"""
+    groups = []
+    scheme = []
+    for word in words:
+        for index, first_word in enumerate(groups):
+            if rhyme_strength(word, first_word) >= PERFECT_RHYME:
+                scheme.append(SCHEME_LETTERS[index % len(SCHEME_LETTERS)])
+                break
+        else:
+            groups.append(word)
+            scheme.append(SCHEME_LETTERS[(len(groups) - 1) % len(SCHEME_LETTERS)])
+    return ''.join(scheme)